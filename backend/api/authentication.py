@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.cache import LRUCache
+
+User = get_user_model()
+
+token_cache = LRUCache(settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+
+def snapshot(instance):
+    """Значения полей модели, из которых собирается новый экземпляр."""
+    return tuple(
+        getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+    )
+
+
+def restore(model, values):
+    return model.from_db(
+        None, [field.attname for field in model._meta.concrete_fields], values
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Авторизация по токену без запроса к БД для недавно виденных
+    токенов. Запись сбрасывается сигналами при выходе, удалении
+    токена и изменении пользователя в этом процессе; в остальных
+    процессах она устаревает не позже чем через TOKEN_CACHE_TTL секунд.
+    Каждый запрос получает собственные экземпляры пользователя и токена."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user, token = cached
+            token = restore(self.get_model(), token)
+            token.user = restore(User, user)
+            return token.user, token
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, (snapshot(user), snapshot(token)))
+        return user, token
+
+
+def forget_user_tokens(user_id):
+    """Сбрасывает все токены пользователя."""
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    for key in keys:
+        token_cache.delete(key)
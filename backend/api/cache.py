@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from recipes.versions import get_version
+
+
+class LRUCache:
+    """Потокобезопасный кэш в памяти процесса с вытеснением
+    давно не использованных записей. Если задан ttl, записи живут
+    не дольше ttl секунд."""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                expires, value = self.data[key]
+            except KeyError:
+                return default
+            if expires is not None and expires <= time.monotonic():
+                del self.data[key]
+                return default
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = None
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+        with self.lock:
+            self.data[key] = (expires, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class VersionedSnapshot:
+    """Данные из БД целиком в памяти процесса. Подкласс задает имя
+    версии version_name и метод build(), который строит данные.
+    Данные перестраиваются при смене версии и не реже чем раз
+    в CATALOG_CACHE_TIMEOUT секунд."""
+    version_name = None
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = (None, 0, None)
+
+    def is_stale(self, version):
+        built, expires, _ = self.state
+        return built != version or expires <= time.monotonic()
+
+    def refresh(self):
+        version = get_version(self.version_name)
+        if self.is_stale(version):
+            with self.lock:
+                if self.is_stale(version):
+                    data = self.build()
+                    self.state = (
+                        version,
+                        time.monotonic() + settings.CATALOG_CACHE_TIMEOUT,
+                        data,
+                    )
+        return self.state[2]
@@ -0,0 +1,32 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Читать ли из основной БД. По умолчанию да: команды, обработчики
+# изображений и запросы на запись не должны видеть отставание реплик.
+use_primary = ContextVar('use_primary', default=True)
+
+
+class PrimaryReplicaRouter:
+    """Запись — в основную БД, чтение — из случайной реплики, если
+    ReplicaRoutingMiddleware разрешила читать из реплик."""
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if (use_primary.get() or not settings.DATABASE_REPLICAS
+                or model._meta.label_lower in settings.PRIMARY_ONLY_MODELS):
+            return 'default'
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -1,12 +1,36 @@
 import django_filters
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework
 
-from recipes.models import Ingredient, Recipe
+from api.cache import VersionedSnapshot
+from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
+from recipes.versions import TAGS
+
+
+class TagSlugs(VersionedSnapshot):
+    """Соответствие слагов тегов их id в памяти процесса."""
+    version_name = TAGS
+
+    def build(self):
+        return dict(Tag.objects.values_list('slug', 'id'))
+
+    def ids(self, slugs):
+        ids = self.refresh()
+        return [ids[slug] for slug in slugs if slug in ids]
+
+
+tag_slugs = TagSlugs()
+
+
+def tag_choices():
+    return [(slug, slug) for slug in tag_slugs.refresh()]
 
 
 class RecipeFilter(rest_framework.FilterSet):
-    tags = django_filters.AllValuesMultipleFilter(
-        field_name='tags__slug'
+    tags = django_filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='get_tags'
     )
     is_favorited = django_filters.NumberFilter(
         method='get_is_favorited'
@@ -14,10 +38,25 @@ class RecipeFilter(rest_framework.FilterSet):
     is_in_shopping_cart = django_filters.NumberFilter(
         method='get_is_shopping_cart'
     )
+    search = django_filters.CharFilter(
+        method='get_search'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'author', 'tags', 'is_in_shopping_cart', )
+        fields = (
+            'is_favorited', 'author', 'tags', 'is_in_shopping_cart', 'search',
+        )
+
+    def get_tags(self, queryset, name, value):
+        """Рецепты хотя бы с одним из тегов. EXISTS вместо соединения
+        с тегами не повторяет рецепт с несколькими подходящими тегами,
+        поэтому DISTINCT не нужен."""
+        return queryset.filter(Exists(
+            Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'), tag_id__in=tag_slugs.ids(value)
+            )
+        ))
 
     def get_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -31,13 +70,5 @@ class RecipeFilter(rest_framework.FilterSet):
             return queryset.filter(in_shopping_cart__user_id=user.id)
         return queryset.all()
 
-
-class IngredientFilter(rest_framework.FilterSet):
-    name = django_filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith'
-    )
-
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
@@ -0,0 +1,45 @@
+import json
+import sys
+from bisect import bisect_left, bisect_right
+
+from api.cache import VersionedSnapshot
+from api.serializers import IngredientSerializer
+from recipes.models import Ingredient
+from recipes.versions import INGREDIENTS
+
+
+class IngredientIndex(VersionedSnapshot):
+    """Индекс ингредиентов в памяти процесса для поиска по началу названия.
+    Хранит отсортированные названия в casefold и готовые JSON-фрагменты
+    ингредиентов."""
+    version_name = INGREDIENTS
+
+    def build(self):
+        entries = sorted(
+            (
+                ingredient.name.casefold(),
+                ingredient.id,
+                json.dumps(
+                    IngredientSerializer(ingredient).data,
+                    ensure_ascii=False,
+                    separators=(',', ':'),
+                ).encode(),
+            )
+            for ingredient in Ingredient.objects.all()
+        )
+        return (
+            [name for name, _, _ in entries],
+            [fragment for _, _, fragment in entries],
+        )
+
+    def search(self, prefix=''):
+        """JSON-фрагменты ингредиентов, название которых начинается
+        с prefix без учета регистра."""
+        names, fragments = self.refresh()
+        prefix = prefix.casefold()
+        start = bisect_left(names, prefix)
+        end = bisect_right(names, prefix + chr(sys.maxunicode), lo=start)
+        return fragments[start:end]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,420 @@
+import base64
+import io
+import json
+import math
+import platform
+import resource
+import time
+import tracemalloc
+import uuid
+from collections import namedtuple
+from contextlib import nullcontext
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Amount, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+# Название, адрес, нужна ли авторизация, методы одного замера.
+ENDPOINTS = (
+    ('recipes_anonymous', '/api/recipes/', False, ('get',)),
+    ('recipes', '/api/recipes/', True, ('get',)),
+    ('recipes_last_page', '/api/recipes/?page={last_page}', True,
+     ('get',)),
+    ('recipes_cursor', '/api/recipes/?cursor=', True, ('get',)),
+    ('recipes_favorited', '/api/recipes/?is_favorited=1', True, ('get',)),
+    ('recipes_in_cart', '/api/recipes/?is_in_shopping_cart=1', True,
+     ('get',)),
+    ('recipes_by_tag', '/api/recipes/?tags={tag}', True, ('get',)),
+    ('recipes_by_author', '/api/recipes/?author={author}', True, ('get',)),
+    ('recipes_search', '/api/recipes/?search={search}', True, ('get',)),
+    ('recipe', '/api/recipes/{recipe}/', True, ('get',)),
+    ('favorite_toggle', '/api/recipes/{recipe}/favorite/', True,
+     ('post', 'delete')),
+    ('cart_toggle', '/api/recipes/{recipe}/shopping_cart/', True,
+     ('post', 'delete')),
+    ('shopping_list', '/api/recipes/shopping_list/', True, ('get',)),
+    ('download_shopping_cart_txt',
+     '/api/recipes/download_shopping_cart/?format=txt', True, ('get',)),
+    ('download_shopping_cart_csv',
+     '/api/recipes/download_shopping_cart/?format=csv', True, ('get',)),
+    ('download_shopping_cart_json',
+     '/api/recipes/download_shopping_cart/?format=json', True, ('get',)),
+    ('tags', '/api/tags/', False, ('get',)),
+    ('tag', '/api/tags/{tag_id}/', False, ('get',)),
+    ('ingredients', '/api/ingredients/', False, ('get',)),
+    ('ingredients_search', '/api/ingredients/?name={ingredient}', False,
+     ('get',)),
+    ('ingredient', '/api/ingredients/{ingredient_id}/', False, ('get',)),
+    ('users', '/api/users/', True, ('get',)),
+    ('user', '/api/users/{author}/', True, ('get',)),
+    ('users_me', '/api/users/me/', True, ('get',)),
+    ('subscriptions', '/api/users/subscriptions/?recipes_limit=3', True,
+     ('get',)),
+    ('subscribe_toggle', '/api/users/{unfollowed}/subscribe/', True,
+     ('post', 'delete')),
+)
+
+# Эндпоинты записи. Данные для каждого замера создает метод
+# Command.prepare_<название> и удаляет после замера.
+WRITES = (
+    'recipe_create',
+    'recipe_patch',
+    'recipe_delete',
+    'favorite_bulk',
+    'cart_bulk',
+    'token_login',
+    'token_logout',
+)
+
+BULK_SIZE = 10
+GUEST_PASSWORD = 'benchmark-password'
+
+# Клиент и запросы одного замера [(метод, адрес, тело)]; cleanup
+# удаляет созданные для замера данные.
+Sample = namedtuple('Sample', ('client', 'requests', 'cleanup'))
+
+
+class PeakMemory:
+    """Пиковая память, выделенная внутри блока, в байтах."""
+
+    def __enter__(self):
+        tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        _, self.peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+
+def percentile(values, percent):
+    """Процентиль по ближайшему рангу для отсортированных values."""
+    index = max(0, math.ceil(percent / 100 * len(values)) - 1)
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = ('Замер задержки (p50/p95/p99), числа запросов к БД и пиковой '
+            'памяти публичных эндпоинтов API. Результат — JSON; с '
+            '--compare сравнивается с прошлым запуском.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='seed_user_0',
+                            help='Пользователь для авторизованных запросов.')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', nargs='+', metavar='ENDPOINT',
+                            help='Замерить только указанные эндпоинты.')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument('--output', help='Файл для результата.')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='JSON прошлого запуска для сравнения.')
+        parser.add_argument(
+            '--threshold', type=float, default=20,
+            help='Допустимый рост p95 в процентах при --compare.'
+        )
+
+    def handle(self, *args, **options):
+        self.iterations = options['iterations']
+        self.warmup = options['warmup']
+        self.cold = options['cold']
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            raise CommandError(
+                f'Нет пользователя {options["user"]}, запустите seed_data.'
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        self.clients = {
+            False: Client(SERVER_NAME='localhost'),
+            True: Client(
+                SERVER_NAME='localhost',
+                HTTP_AUTHORIZATION=f'Token {token.key}'
+            ),
+        }
+        self.user = user
+        self.params = self.get_params(user)
+        self.prepare_fixtures()
+        samples = {
+            name: self.get_read_sample(url.format(**self.params), auth,
+                                       methods)
+            for name, url, auth, methods in ENDPOINTS
+        }
+        samples.update(
+            (name, getattr(self, f'prepare_{name}')) for name in WRITES
+        )
+        cache.clear()
+        results = {
+            name: self.measure(prepare) for name, prepare in samples.items()
+            if not options['only'] or name in options['only']
+        }
+        report = {'meta': self.get_meta(), 'endpoints': results}
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            self.compare(options['compare'], results, options['threshold'])
+
+    def get_params(self, user):
+        """Значения для адресов, одинаковые для одного набора данных."""
+        recipe = (
+            Recipe.objects.exclude(favorited__user=user)
+            .exclude(in_shopping_cart__user=user).order_by('pk').first()
+        )
+        author = (
+            User.objects.filter(following__user=user).order_by('pk').first()
+            or user
+        )
+        unfollowed = (
+            User.objects.exclude(pk=user.pk)
+            .exclude(following__user=user).order_by('pk').first()
+        )
+        tag = Tag.objects.order_by('pk').first()
+        ingredient = Ingredient.objects.order_by('pk').first()
+        if None in (recipe, unfollowed, tag, ingredient):
+            raise CommandError('Нет данных для замеров, запустите seed_data.')
+        return {
+            'recipe': recipe.pk,
+            'author': author.pk,
+            'unfollowed': unfollowed.pk,
+            'tag': tag.slug,
+            'tag_id': tag.pk,
+            'ingredient': ingredient.name[:3],
+            'ingredient_id': ingredient.pk,
+            'search': recipe.name.split()[0],
+            'last_page': max(1, math.ceil(Recipe.objects.count() / 6)),
+        }
+
+    def prepare_fixtures(self):
+        """Общие для замеров записи значения: теги, ингредиенты, рецепты
+        не из списков пользователя, изображение и хэш пароля."""
+        self.tag_ids = list(
+            Tag.objects.order_by('pk').values_list('pk', flat=True)[:2]
+        )
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)[:4]
+        )
+        self.bulk_ids = list(
+            Recipe.objects.exclude(favorited__user=self.user)
+            .exclude(in_shopping_cart__user=self.user)
+            .order_by('pk').values_list('pk', flat=True)[:BULK_SIZE]
+        )
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), 'orange').save(buffer, 'PNG')
+        self.image = 'data:image/png;base64,{}'.format(
+            base64.b64encode(buffer.getvalue()).decode()
+        )
+        self.guest_password = make_password(GUEST_PASSWORD)
+
+    def get_read_sample(self, url, auth, methods):
+        sample = Sample(
+            self.clients[auth], [(method, url, None) for method in methods],
+            None
+        )
+        return lambda: sample
+
+    def get_name(self):
+        return f'benchmark {uuid.uuid4().hex[:12]}'
+
+    def create_recipe(self):
+        recipe = Recipe.objects.create(
+            name=self.get_name(), author=self.user, text='Описание',
+            cooking_time=10
+        )
+        recipe.tags.add(*self.tag_ids)
+        Amount.objects.bulk_create(
+            Amount(recipe=recipe, ingredient_id=ingredient_id, amount=100)
+            for ingredient_id in self.ingredient_ids[:3]
+        )
+        return recipe
+
+    def delete_recipes(self, **lookup):
+        for recipe in Recipe.objects.filter(author=self.user, **lookup):
+            if recipe.image:
+                recipe.image.delete(save=False)
+            recipe.delete()
+
+    def create_guest(self):
+        name = uuid.uuid4().hex[:12]
+        return User.objects.create(
+            username=f'benchmark_{name}', email=f'{name}@example.com',
+            first_name='Benchmark', last_name='Benchmark',
+            password=self.guest_password
+        )
+
+    def prepare_recipe_create(self):
+        name = self.get_name()
+        return Sample(self.clients[True], [('post', '/api/recipes/', {
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': self.tag_ids,
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 100}
+                for ingredient_id in self.ingredient_ids[:3]
+            ],
+            'image': self.image,
+        })], lambda: self.delete_recipes(name=name))
+
+    def prepare_recipe_patch(self):
+        """Новое название, тег и состав: одна строка меняется, одна
+        остается, одна удаляется и одна добавляется."""
+        recipe = self.create_recipe()
+        first, *rest = self.ingredient_ids
+        ingredients = [{'id': first, 'amount': 150}] + [
+            {'id': ingredient_id, 'amount': 100}
+            for ingredient_id in rest[:1] + rest[2:]
+        ]
+        return Sample(self.clients[True], [
+            ('patch', f'/api/recipes/{recipe.pk}/', {
+                'name': self.get_name(),
+                'tags': self.tag_ids[:1],
+                'ingredients': ingredients,
+            })
+        ], lambda: self.delete_recipes(pk=recipe.pk))
+
+    def prepare_recipe_delete(self):
+        recipe = self.create_recipe()
+        return Sample(
+            self.clients[True],
+            [('delete', f'/api/recipes/{recipe.pk}/', None)],
+            lambda: self.delete_recipes(pk=recipe.pk)
+        )
+
+    def get_bulk_sample(self, url):
+        body = {'recipes': self.bulk_ids}
+        return Sample(
+            self.clients[True], [('post', url, body), ('delete', url, body)],
+            None
+        )
+
+    def prepare_favorite_bulk(self):
+        return self.get_bulk_sample('/api/recipes/favorite/')
+
+    def prepare_cart_bulk(self):
+        return self.get_bulk_sample('/api/recipes/shopping_cart/')
+
+    def prepare_token_login(self):
+        guest = self.create_guest()
+        return Sample(self.clients[False], [
+            ('post', '/api/auth/token/login/', {
+                'email': guest.email, 'password': GUEST_PASSWORD,
+            })
+        ], guest.delete)
+
+    def prepare_token_logout(self):
+        guest = self.create_guest()
+        token = Token.objects.create(user=guest)
+        client = Client(
+            SERVER_NAME='localhost', HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+        return Sample(
+            client, [('post', '/api/auth/token/logout/', None)], guest.delete
+        )
+
+    def request(self, sample):
+        """Запросы одного замера подряд, ответы читаются целиком."""
+        if self.cold:
+            cache.clear()
+        for method, url, data in sample.requests:
+            if data is None:
+                response = getattr(sample.client, method)(url)
+            else:
+                response = getattr(sample.client, method)(
+                    url, json.dumps(data), content_type='application/json'
+                )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{method.upper()} {url}: ответ {response.status_code}.'
+                )
+
+    def run(self, prepare, probe=None):
+        """Один замер. Подготовка и удаление данных в замер не входят,
+        probe (контекстный менеджер) охватывает только запросы."""
+        sample = prepare()
+        try:
+            with probe if probe is not None else nullcontext():
+                start = time.perf_counter()
+                self.request(sample)
+                elapsed = (time.perf_counter() - start) * 1000
+        finally:
+            if sample.cleanup is not None:
+                sample.cleanup()
+        return sample, elapsed
+
+    def measure(self, prepare):
+        for _ in range(self.warmup):
+            self.run(prepare)
+        timings = sorted(
+            self.run(prepare)[1] for _ in range(self.iterations)
+        )
+        context = CaptureQueriesContext(connection)
+        self.run(prepare, context)
+        # Журнал запросов очищается в начале следующего запроса.
+        queries = len(context)
+        memory = PeakMemory()
+        sample, _ = self.run(prepare, memory)
+        return {
+            'url': sample.requests[0][1],
+            'methods': [method.upper() for method, _, _ in sample.requests],
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': queries,
+            'peak_memory_kb': round(memory.peak / 1024, 1),
+        }
+
+    def get_meta(self):
+        return {
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': self.iterations,
+            'warmup': self.warmup,
+            'cold_cache': self.cold,
+            'dataset': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+                'tags': Tag.objects.count(),
+            },
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+    def compare(self, path, results, threshold):
+        """Сравнение с прошлым запуском. Рост p95 больше threshold
+        процентов или рост числа запросов считается регрессией."""
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)['endpoints']
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            change = (result['p95_ms'] / before['p95_ms'] - 1) * 100
+            queries = result['queries'] - before['queries']
+            self.stderr.write(
+                f'{name:32} p95 {before["p95_ms"]:9.2f} -> '
+                f'{result["p95_ms"]:9.2f} ms ({change:+.0f}%), '
+                f'запросов {before["queries"]} -> {result["queries"]}'
+            )
+            if change > threshold or queries > 0:
+                regressions.append(name)
+        if regressions:
+            raise CommandError(f'Регрессии: {", ".join(regressions)}.')
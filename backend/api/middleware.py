@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+from api.db_router import use_primary
+
+logger = logging.getLogger('foodgram.db')
+
+PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+NUMBER = re.compile(r'\b\d+\b')
+WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Отпечаток запроса: SQL без значений и длины списков IN (...)."""
+    sql = PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = NUMBER.sub('?', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryStats:
+    """Обертка execute: считает запросы, время и повторы по отпечаткам."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+
+@contextmanager
+def count_queries(stats):
+    """Передает в stats все запросы ко всем БД внутри блока."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield
+
+
+class DatabaseStatsMiddleware:
+    """Число запросов и время работы с БД для каждого запроса.
+    Добавляет заголовки X-DB-Queries и X-DB-Time (мс) и пишет в лог
+    медленные запросы с самыми частыми повторяющимися SQL.
+    Учитывается доля запросов DB_STATS_SAMPLE_RATE, остальные
+    проходят без обертки.
+    Заголовки потокового ответа отправляются до тела, поэтому в них нет
+    запросов, выполненных при его отдаче; они учитываются в логе, который
+    пишется после отдачи тела."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.DB_STATS_SAMPLE_RATE
+        self.slow_request = settings.DB_STATS_SLOW_REQUEST_MS / 1000
+        self.top_queries = settings.DB_STATS_TOP_QUERIES
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        stats = QueryStats()
+        start = time.perf_counter()
+        with count_queries(stats):
+            response = self.get_response(request)
+        response['X-DB-Queries'] = stats.count
+        response['X-DB-Time'] = f'{stats.duration * 1000:.1f}'
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, request, start, stats
+            )
+        else:
+            self.finish(request, start, stats)
+        return response
+
+    def stream(self, content, request, start, stats):
+        try:
+            with count_queries(stats):
+                yield from content
+        finally:
+            self.finish(request, start, stats)
+
+    def finish(self, request, start, stats):
+        elapsed = time.perf_counter() - start
+        if elapsed >= self.slow_request:
+            self.log_slow_request(request, elapsed, stats)
+
+    def log_slow_request(self, request, elapsed, stats):
+        repeated = [
+            f'{count}x {sql}'
+            for sql, count in stats.fingerprints.most_common(self.top_queries)
+            if count > 1
+        ]
+        logger.warning(
+            'Медленный запрос %s %s: %.1f мс, запросов к БД %d (%.1f мс)%s',
+            request.method,
+            request.get_full_path(),
+            elapsed * 1000,
+            stats.count,
+            stats.duration * 1000,
+            ''.join(f'\n  {line}' for line in repeated),
+        )
+
+
+class ReplicaRoutingMiddleware:
+    """Безопасные запросы читают из реплик. После запроса на запись
+    клиент REPLICA_PIN_SECONDS секунд читает из основной БД, чтобы
+    видеть свои изменения, пока реплики их не получили."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = settings.REPLICA_PIN_SECONDS
+
+    def get_pin_key(self, request):
+        """Ключ клиента: токен, сессия или адрес, в виде хэша."""
+        client = (
+            request.META.get('HTTP_AUTHORIZATION')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            or request.META.get('REMOTE_ADDR', '')
+        )
+        digest = hashlib.sha256(client.encode()).hexdigest()
+        return f'replica-pin:{digest}'
+
+    def __call__(self, request):
+        key = self.get_pin_key(request)
+        writes = request.method not in SAFE_METHODS
+        token = use_primary.set(writes or bool(cache.get(key)))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_primary.reset(token)
+        if writes:
+            cache.set(key, True, self.pin_seconds)
+        return response
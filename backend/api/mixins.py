@@ -0,0 +1,61 @@
+import hashlib
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import parse_etags, patch_cache_control
+from rest_framework.renderers import JSONRenderer
+
+from api.cache import LRUCache
+from recipes.versions import get_version
+
+
+class CatalogCacheMixin:
+    """Кэш готовых ответов справочника с ETag и Cache-Control.
+    Ключ кэша включает версию справочника catalog_version, поэтому
+    зафиксированные записи в справочник делают старые ответы
+    неактуальными."""
+    catalog_version = None
+    catalog_cache = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.catalog_cache = LRUCache(
+            settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TIMEOUT
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, self.render_list)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, self.render_retrieve)
+
+    def render_list(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        return JSONRenderer().render(
+            self.get_serializer(queryset, many=True).data
+        )
+
+    def render_retrieve(self):
+        return JSONRenderer().render(
+            self.get_serializer(self.get_object()).data
+        )
+
+    def cached_response(self, request, render):
+        key = (get_version(self.catalog_version), request.get_full_path())
+        entry = self.catalog_cache.get(key)
+        if entry is None:
+            content = render()
+            etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+            entry = (content, etag)
+            self.catalog_cache.set(key, entry)
+        content, etag = entry
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE
+        )
+        return response
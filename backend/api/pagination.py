@@ -1,7 +1,109 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from recipes.versions import get_versions, user_lists
+
+
+class KeysetPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+    page_size = 6
+
+    def __init__(self, ordering):
+        self.ordering = ordering
 
 
 class CustomPagination(PageNumberPagination):
+    """Постраничная навигация по номеру страницы.
+    Если во вьюсете задан cursor_ordering, параметр ?cursor= включает
+    навигацию по ключу: без OFFSET и без подсчета общего числа записей.
+    Если задан count_versions, общее число записей кэшируется по
+    параметрам фильтрации и версиям данных."""
     page_size_query_param = 'limit'
     max_page_size = 1000
     page_size = 6
+    cursor_query_param = 'cursor'
+    keyset = None
+    view = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        ordering = getattr(view, 'cursor_ordering', None)
+        if ordering and self.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(ordering)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def django_paginator_class(self, queryset, page_size):
+        paginator = DjangoPaginator(queryset, page_size)
+        if getattr(self.view, 'count_versions', None):
+            paginator.count = self.get_count(queryset)
+        return paginator
+
+    def get_filter_params(self):
+        ignored = (
+            self.page_query_param,
+            self.page_size_query_param,
+            self.cursor_query_param,
+        )
+        return sorted(
+            (name, sorted(values))
+            for name, values in self.request.query_params.lists()
+            if name not in ignored
+        )
+
+    def get_count_cache_key(self, params):
+        names = list(self.view.count_versions)
+        user = self.request.user
+        per_user = getattr(self.view, 'count_user_params', ())
+        if user.is_authenticated and any(
+            name in per_user for name, _ in params
+        ):
+            names.append(user_lists(user.id))
+        else:
+            user = None
+        versions = get_versions(names)
+        digest = hashlib.md5(repr(
+            (params, getattr(user, 'id', None), sorted(versions.items()))
+        ).encode()).hexdigest()
+        return f'count:{type(self.view).__name__}:{digest}'
+
+    def get_count(self, queryset):
+        params = self.get_filter_params()
+        key = self.get_count_cache_key(params)
+        count = cache.get(key)
+        if count is None:
+            count = None if params else self.estimate_count(queryset)
+            if count is None:
+                count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def estimate_count(self, queryset):
+        """Оценка планировщика PostgreSQL для неотфильтрованного списка.
+        Для небольших таблиц возвращает None: точный подсчет дешев."""
+        connection = connections[queryset.db]
+        if (not settings.PAGINATION_ESTIMATE_COUNT
+                or connection.vendor != 'postgresql'):
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if not row or row[0] < settings.PAGINATION_ESTIMATE_MIN_ROWS:
+            return None
+        return row[0]
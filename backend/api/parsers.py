@@ -0,0 +1,85 @@
+import json
+
+from django.conf import settings
+from django.core.files.uploadhandler import (FileUploadHandler,
+                                             TemporaryFileUploadHandler)
+from django.http.multipartparser import MultiPartParser as DjangoParser
+from django.http.multipartparser import MultiPartParserError
+from django.utils.datastructures import MultiValueDict
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Файл слишком большой.'
+    default_code = 'upload_too_large'
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Прерывает загрузку, как только файл превысил max_bytes,
+    не дожидаясь конца запроса."""
+
+    def __init__(self, request=None, max_bytes=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes or settings.RECIPE_IMAGE_MAX_BYTES
+        self.received = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary,
+                         encoding=None):
+        limit = self.max_bytes + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        if content_length > limit:
+            raise UploadTooLarge
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            raise UploadTooLarge
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class RecipeMultiPartParser(MultiPartParser):
+    """multipart/form-data для рецептов: файлы пишутся во временный
+    файл по частям с ограничением размера, а вложенные поля
+    (json_fields) передаются JSON-строками."""
+    json_fields = ('ingredients', 'tags')
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context['request']
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+        upload_handlers = [
+            LimitedUploadHandler(request),
+            TemporaryFileUploadHandler(request),
+        ]
+        try:
+            parser = DjangoParser(meta, stream, upload_handlers, encoding)
+            data, files = parser.parse()
+        except MultiPartParserError as exc:
+            raise ParseError('Multipart form parse error - %s' % str(exc))
+        # Файлы сразу входят в data: обычный dict, в отличие от
+        # QueryDict, не умеет объединяться с MultiValueDict.
+        return DataAndFiles(
+            {**self.decode_json(data), **files.dict()}, MultiValueDict()
+        )
+
+    def decode_json(self, data):
+        data = data.dict()
+        for field in self.json_fields:
+            if field not in data:
+                continue
+            try:
+                data[field] = json.loads(data[field])
+            except ValueError:
+                raise ParseError(f'Поле {field} должно содержать JSON.')
+        return data
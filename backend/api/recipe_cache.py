@@ -0,0 +1,75 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+
+from api.cache import LRUCache
+from recipes.versions import (INGREDIENTS, TAGS, author_profile, get_versions,
+                              recipe_payload)
+
+
+class RecipePayloadCache:
+    """Кэш не зависящей от пользователя части представления рецепта.
+    Первый уровень — LRU в памяти процесса, второй — общий кэш
+    RECIPE_CACHE_ALIAS, если он задан. Ключ включает версии рецепта,
+    его автора и справочников, поэтому запись в любой из них делает
+    старые представления недоступными во всех процессах. Изображение
+    и его копии, которые обновляет обработчик в отдельном процессе,
+    входят в ключ напрямую из загруженной строки рецепта."""
+
+    def __init__(self):
+        self.local = LRUCache(
+            settings.RECIPE_CACHE_SIZE, ttl=settings.RECIPE_LOCAL_CACHE_TIMEOUT
+        )
+
+    @property
+    def shared(self):
+        alias = settings.RECIPE_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get_keys(self, recipes):
+        """Ключи кэша для рецептов: {recipe.id: key}."""
+        names = {TAGS, INGREDIENTS}
+        for recipe in recipes:
+            names.add(recipe_payload(recipe.id))
+            names.add(author_profile(recipe.author_id))
+        versions = get_versions(names)
+        catalog = f'{versions[TAGS]}:{versions[INGREDIENTS]}'
+        return {
+            recipe.id: 'recipe:{}:{}:{}:{}:{}'.format(
+                recipe.id,
+                versions[recipe_payload(recipe.id)],
+                versions[author_profile(recipe.author_id)],
+                catalog,
+                self.get_image_stamp(recipe),
+            )
+            for recipe in recipes
+        }
+
+    def get_image_stamp(self, recipe):
+        return hashlib.md5(json.dumps(
+            [recipe.image.name, recipe.image_variants], sort_keys=True
+        ).encode()).hexdigest()
+
+    def get_many(self, keys):
+        found = {}
+        for key in keys:
+            payload = self.local.get(key)
+            if payload is not None:
+                found[key] = payload
+        missing = [key for key in keys if key not in found]
+        if missing and self.shared is not None:
+            for key, payload in self.shared.get_many(missing).items():
+                self.local.set(key, payload)
+                found[key] = payload
+        return found
+
+    def set_many(self, payloads):
+        for key, payload in payloads.items():
+            self.local.set(key, payload)
+        if self.shared is not None:
+            self.shared.set_many(payloads, settings.RECIPE_CACHE_TIMEOUT)
+
+
+recipe_cache = RecipePayloadCache()
@@ -0,0 +1,62 @@
+import csv
+import json
+
+from rest_framework.renderers import JSONRenderer
+
+
+class ShoppingListRenderer(JSONRenderer):
+    """Формат файла списка покупок, выбирается параметром ?format=.
+    Сам список отдается потоком через stream() подкласса, а render() нужен
+    только для ответов с ошибками."""
+    charset = 'utf-8'
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        separator = ''
+        yield 'Cписок покупок:\n'
+        for row in rows:
+            yield separator + '{} ({}) — {}'.format(*row)
+            separator = '\n'
+
+
+class Echo:
+    """Буфер для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Единица измерения', 'Количество')
+        )
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    format = 'json'
+
+    def stream(self, rows):
+        separator = ''
+        yield '['
+        for name, measurement_unit, amount in rows:
+            yield separator + json.dumps(
+                {
+                    'name': name,
+                    'measurement_unit': measurement_unit,
+                    'amount': amount,
+                },
+                ensure_ascii=False
+            )
+            separator = ','
+        yield ']'
@@ -1,10 +1,22 @@
 import base64
+import json
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import (Case, IntegerField, Prefetch, Value, When,
+                              prefetch_related_objects)
+from PIL import Image
 from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
 
-from recipes.models import Amount, Ingredient, Recipe, ShoppingCart, Tag
+from api.recipe_cache import recipe_cache
+from recipes import images, totals
+from recipes.models import (Amount, Ingredient, Recipe, ShoppingCart,
+                            ShoppingCartTotal, Tag)
+from recipes.search import index_recipes
 from users.models import Follow
 from users.serializers import UsersSerializer
 
@@ -12,13 +24,67 @@ User = get_user_model()
 
 
 class Base64ImageField(serializers.ImageField):
+    """Изображение строкой base64 или файлом multipart/form-data.
+    Размер в байтах и пикселях проверяется до декодирования."""
+    default_error_messages = {
+        'max_bytes': 'Размер изображения больше {max_bytes} байт.',
+        'max_pixels': 'Изображение больше {max_pixels} пикселей.',
+    }
+
     def to_internal_value(self, data):
+        max_bytes = settings.RECIPE_IMAGE_MAX_BYTES
         if isinstance(data, str) and data.startswith('data:image'):
             format, imgstr = data.split(';base64,')
+            if len(imgstr) * 3 // 4 > max_bytes:
+                self.fail('max_bytes', max_bytes=max_bytes)
             ext = format.split('/')[-1]
             data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+        if getattr(data, 'size', 0) > max_bytes:
+            self.fail('max_bytes', max_bytes=max_bytes)
+        self.check_pixels(data)
         return super().to_internal_value(data)
 
+    def check_pixels(self, file):
+        """Размеры читаются из заголовка, без декодирования растра."""
+        if not hasattr(file, 'seek'):
+            return
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except (OSError, Image.DecompressionBombError):
+            self.fail('invalid_image')
+        finally:
+            file.seek(0)
+        if width * height > max_pixels:
+            self.fail('max_pixels', max_pixels=max_pixels)
+
+
+class ImageVariantsField(serializers.Field):
+    """Ссылки на уменьшенные копии изображения рецепта. Пока копии
+    не готовы, вместо них отдаётся исходное изображение."""
+
+    def __init__(self, **kwargs):
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        request = self.context.get('request')
+        data = {}
+        for size in settings.RECIPE_IMAGE_VARIANTS:
+            variants = recipe.image_variants.get(size, {})
+            data[size] = {}
+            for extension in images.FORMATS:
+                url = default_storage.url(
+                    variants.get(extension, recipe.image.name)
+                )
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                data[size][extension] = url
+        return data
+
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -55,11 +121,46 @@ class IngredientAmountSerializer(serializers.Serializer):
         return value
 
 
+class AuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+class RecipePayloadSerializer(serializers.ModelSerializer):
+    """Общая для всех пользователей часть представления рецепта."""
+    author = AuthorSerializer()
+    ingredients = AmountSerializer(many=True)
+    tags = TagSerializer(many=True)
+    image = serializers.ImageField()
+    images = ImageVariantsField()
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id',
+            'tags',
+            'author',
+            'ingredients',
+            'name',
+            'image',
+            'images',
+            'text',
+            'cooking_time',
+        )
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        return self.child.represent(list(data))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = UsersSerializer(read_only=True)
     ingredients = AmountSerializer(many=True)
     tags = TagSerializer(many=True)
     image = Base64ImageField(required=True)
+    images = ImageVariantsField()
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
 
@@ -72,16 +173,91 @@ class RecipeSerializer(serializers.ModelSerializer):
             'ingredients',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time',
             'is_favorited',
             'is_in_shopping_cart'
         )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.represent([instance])[0]
+
+    def represent(self, recipes):
+        """Представления рецептов: общая часть берётся из кэша, поверх
+        неё накладываются флаги текущего пользователя."""
+        keys = recipe_cache.get_keys(recipes)
+        payloads = recipe_cache.get_many(list(keys.values()))
+        missing = [
+            recipe for recipe in recipes if keys[recipe.id] not in payloads
+        ]
+        if missing:
+            payloads.update(self.render_payloads(missing, keys))
+        subscribed = self.get_subscribed(recipes)
+        data = []
+        for recipe in recipes:
+            payload = payloads[keys[recipe.id]]
+            data.append({
+                **payload,
+                'author': {
+                    **payload['author'],
+                    'is_subscribed': recipe.author_id in subscribed,
+                },
+                'image': self.absolute_url(payload['image']),
+                'images': payload['images'] and {
+                    size: {
+                        extension: self.absolute_url(url)
+                        for extension, url in variants.items()
+                    }
+                    for size, variants in payload['images'].items()
+                },
+                'is_favorited': self.get_is_favorited(recipe),
+                'is_in_shopping_cart': self.get_is_in_shopping_cart(recipe),
+            })
+        return data
+
+    def absolute_url(self, url):
+        request = self.context.get('request')
+        if url and request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def render_payloads(self, recipes, keys):
+        prefetch_related_objects(
+            recipes,
+            'tags',
+            Prefetch(
+                'ingredients',
+                queryset=Amount.objects.select_related('ingredient')
+            ),
+        )
+        rendered = JSONRenderer().render(
+            RecipePayloadSerializer(recipes, many=True).data
+        )
+        payloads = {
+            keys[recipe.id]: payload
+            for recipe, payload in zip(recipes, json.loads(rendered))
+        }
+        recipe_cache.set_many(payloads)
+        return payloads
+
+    def get_subscribed(self, recipes):
+        """Авторы страницы, на которых подписан пользователь."""
+        request = self.context.get('request')
+        if request is None or request.user.is_anonymous:
+            return set()
+        return set(request.user.follower.filter(
+            author_id__in={recipe.author_id for recipe in recipes}
+        ).values_list('author_id', flat=True))
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
+        is_favorited = getattr(obj, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
         favorite = request.user.favorites.filter(recipe=obj)
         return favorite.exists()
 
@@ -89,14 +265,19 @@ class RecipeSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request.user.is_anonymous:
             return False
+        is_in_shopping_cart = getattr(obj, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
         shopping_cart = request.user.cart.filter(recipe=obj)
         return shopping_cart.exists()
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    images = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
@@ -113,14 +294,24 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         )
 
     def validate_ingredients(self, data):
-        unique_ingredient = []
-        for ingredient in data:
-            id = ingredient.get('id')
-            if id in unique_ingredient:
-                raise serializers.ValidationError(
-                    'Нельзя дублировать имена ингредиентов.'
-                )
-            unique_ingredient.append(id)
+        """Проверка дублей и существования ингредиентов одним запросом.
+        Ошибки возвращаются по позициям в списке, как у many=True."""
+        ids = [ingredient['id'] for ingredient in data]
+        existing = set(
+            Ingredient.objects.filter(id__in=ids).values_list('id', flat=True)
+        )
+        errors = [{} for _ in ids]
+        seen = set()
+        for index, id in enumerate(ids):
+            if id not in existing:
+                errors[index] = {'id': [f'Ингредиента с id={id} нет.']}
+            elif id in seen:
+                errors[index] = {
+                    'id': ['Нельзя дублировать имена ингредиентов.']
+                }
+            seen.add(id)
+        if any(errors):
+            raise serializers.ValidationError(errors)
         return data
 
     def add_ingredients(self, ingredients_list, recipe):
@@ -132,6 +323,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             ) for ingredient in ingredients_list
         ])
 
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request')
         author = request.user
@@ -140,31 +332,73 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.add(*tags)
         self.add_ingredients(ingredients, recipe)
+        index_recipes([recipe.id])
+        images.enqueue(recipe)
         return recipe
 
+    def set_ingredients(self, recipe, ingredients):
+        """Приводит состав рецепта к новому, меняя только отличающиеся
+        строки. Возвращает True, если набор ингредиентов изменился."""
+        old = dict(recipe.ingredients.values_list('ingredient_id', 'amount'))
+        new = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        if old == new:
+            return False
+        removed = old.keys() - new.keys()
+        if removed:
+            recipe.ingredients.filter(ingredient_id__in=removed).delete()
+        self.add_ingredients(
+            [
+                ingredient for ingredient in ingredients
+                if ingredient['id'] not in old
+            ],
+            recipe
+        )
+        changed = {
+            ingredient_id: amount for ingredient_id, amount in new.items()
+            if ingredient_id in old and old[ingredient_id] != amount
+        }
+        if changed:
+            recipe.ingredients.filter(ingredient_id__in=changed).update(
+                amount=Case(
+                    *(
+                        When(ingredient_id=ingredient_id, then=Value(amount))
+                        for ingredient_id, amount in changed.items()
+                    ),
+                    output_field=IntegerField()
+                )
+            )
+        totals.change_recipe(recipe, old, new)
+        return old.keys() != new.keys()
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
-        instance.tags.clear()
-        instance.tags.add(*tags)
-        instance.ingredients.all().delete()
-        self.add_ingredients(ingredients, instance)
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        reindex = any(
+            field in validated_data
+            and validated_data[field] != getattr(instance, field)
+            for field in ('name', 'text')
+        )
+        if ingredients is not None:
+            reindex |= self.set_ingredients(instance, ingredients)
+        if 'image' in validated_data:
+            instance.image_variants = {}
         super().update(instance, validated_data)
+        if reindex:
+            index_recipes([instance.id])
+        if 'image' in validated_data:
+            images.enqueue(instance)
         return instance
 
 
-class FavoriteSerializer(serializers.Serializer):
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        return RecipeShortSerializer(
-            instance.recipe,
-            context={'request': request}
-        ).data
-
-
 class FollowListSerializer(serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -180,11 +414,12 @@ class FollowListSerializer(serializers.ModelSerializer):
             'recipes_count'
         )
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def get_recipes(self, obj):
         request = self.context.get('request')
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is not None:
+            return RecipeShortSerializer(
+                recipes, many=True, context={'request': request}).data
         recipes_limit = request.query_params.get('recipes_limit')
         data = Recipe.objects.filter(author=obj)
         if not recipes_limit:
@@ -199,6 +434,9 @@ class FollowListSerializer(serializers.ModelSerializer):
         user = request.user
         if not request or user.is_anonymous:
             return False
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         subscribe = user.follower.filter(author=obj)
         return subscribe.exists()
 
@@ -228,7 +466,27 @@ class FollowSerializer(serializers.ModelSerializer):
         return data
 
 
+class ShoppingCartTotalSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient.id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = ShoppingCartTotal
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
 class ShoppingCartSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingCart
         fields = ('id', 'user', 'recipe',)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для массового добавления и удаления."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BULK_MAX_IDS
+    )
@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import forget_user_tokens, token_cache
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    """Выход через djoser и удаление токена."""
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, update_fields, **kwargs):
+    """Смена пароля, деактивация и любые правки пользователя."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    forget_user_tokens(instance.id)
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.authentication import token_cache
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTest(APITestCase):
+    """Токен проверяется по БД один раз и сбрасывается при выходе,
+    смене пароля и деактивации."""
+
+    URL = '/api/users/me/'
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='User', last_name='User', password='old-password'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def assert_cached(self):
+        self.client.get(self.URL)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], self.user.username)
+
+    def test_second_request_skips_token_query(self):
+        self.assert_cached()
+
+    def test_logout(self):
+        self.assert_cached()
+        response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(self.URL).status_code, 401)
+
+    def test_password_change(self):
+        self.assert_cached()
+        response = self.client.post('/api/users/set_password/', {
+            'current_password': 'old-password',
+            'new_password': 'new-Password-123',
+        })
+        self.assertEqual(response.status_code, 204, response.data)
+        with self.assertNumQueries(1):
+            self.client.get(self.URL)
+
+    def test_deactivation(self):
+        self.assert_cached()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.URL).status_code, 401)
+
+    def test_token_deleted(self):
+        self.assert_cached()
+        self.token.delete()
+        self.assertEqual(self.client.get(self.URL).status_code, 401)
@@ -0,0 +1,85 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from api.management.commands.benchmark import ENDPOINTS, WRITES
+from recipes.models import (Amount, Favorite, ImageJob, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class BenchmarkTest(TestCase):
+    """Один проход замеров по всем эндпоинтам: запросы успешны, а
+    данные, созданные для замеров записи, удалены."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, *authors = [
+            User.objects.create_user(
+                email=f'user{i}@example.com', username=f'user{i}',
+                first_name='User', last_name='User', password='pass'
+            ) for i in range(3)
+        ]
+        Follow.objects.create(user=cls.user, author=authors[0])
+        tags = [
+            Tag.objects.create(
+                name=f'tag{i}', color=f'#00000{i}', slug=f'tag{i}'
+            ) for i in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{i}', measurement_unit='г'
+            ) for i in range(4)
+        ]
+        for i in range(4):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {i}', author=authors[i % 2], text='text',
+                cooking_time=10
+            )
+            recipe.tags.add(*tags)
+            Amount.objects.bulk_create(
+                Amount(recipe=recipe, ingredient=ingredient, amount=i + 1)
+                for ingredient in ingredients[:3]
+            )
+        Favorite.objects.create(user=cls.user, recipe=recipe)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def snapshot(self):
+        return {
+            model.__name__: sorted(model.objects.values_list('pk', flat=True))
+            for model in (User, Recipe, Amount, Favorite, ShoppingCart,
+                          Follow, ImageJob)
+        }
+
+    def test_all_endpoints(self):
+        before = self.snapshot()
+        stdout = StringIO()
+        call_command(
+            'benchmark', user=self.user.username, iterations=2, warmup=0,
+            stdout=stdout
+        )
+        results = json.loads(stdout.getvalue())['endpoints']
+        self.assertEqual(
+            set(results), {endpoint[0] for endpoint in ENDPOINTS} | set(WRITES)
+        )
+        self.assertEqual(results['recipe_create']['methods'], ['POST'])
+        self.assertEqual(
+            results['favorite_bulk']['methods'], ['POST', 'DELETE']
+        )
+        for name in WRITES:
+            self.assertGreater(results[name]['queries'], 0, name)
+        self.assertEqual(self.snapshot(), before)
@@ -0,0 +1,116 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Tag
+from recipes.versions import INGREDIENTS, TAGS, get_version
+
+
+class CatalogCacheTest(APITestCase):
+    """Ответ справочника обновляется со сменой версии, а без нее —
+    не позже чем через CATALOG_CACHE_TIMEOUT."""
+
+    URL = '/api/tags/'
+
+    def setUp(self):
+        cache.clear()
+        Tag.objects.create(name='Завтрак', color='#000000', slug='breakfast')
+
+    def get_slugs(self):
+        return [tag['slug'] for tag in self.client.get(self.URL).json()]
+
+    def test_expires_without_version_change(self):
+        self.assertEqual(self.get_slugs(), ['breakfast'])
+        # Запись в обход сигналов, как из процесса с другим кэшем.
+        Tag.objects.bulk_create([
+            Tag(name='Ужин', color='#FFFFFF', slug='dinner')
+        ])
+        self.assertEqual(self.get_slugs(), ['breakfast'])
+        later = time.monotonic() + settings.CATALOG_CACHE_TIMEOUT + 1
+        with mock.patch('api.cache.time.monotonic', return_value=later):
+            self.assertEqual(self.get_slugs(), ['breakfast', 'dinner'])
+
+    def test_version_change(self):
+        self.assertEqual(self.get_slugs(), ['breakfast'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Ужин', color='#FFFFFF', slug='dinner')
+        self.assertEqual(self.get_slugs(), ['breakfast', 'dinner'])
+
+    def test_version_bumped_on_commit(self):
+        for model, name, create in (
+            (Tag, TAGS, lambda: Tag.objects.create(
+                name='Ужин', color='#FFFFFF', slug='dinner'
+            )),
+            (Ingredient, INGREDIENTS, lambda: Ingredient.objects.create(
+                name='сахар', measurement_unit='г'
+            )),
+        ):
+            with self.subTest(model=model.__name__):
+                before = get_version(name)
+                with self.captureOnCommitCallbacks(execute=True):
+                    create()
+                    # Читатель до фиксации не сохранит старые данные
+                    # под новой версией.
+                    self.assertEqual(get_version(name), before)
+                self.assertNotEqual(get_version(name), before)
+
+    def test_not_modified(self):
+        response = self.client.get(self.URL)
+        etag = response['ETag']
+        self.assertIn('max-age=', response['Cache-Control'])
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_on_save(self):
+        tag = Tag.objects.get()
+        ingredient = Ingredient.objects.create(
+            name='сахар', measurement_unit='г'
+        )
+        for url, obj in (
+            (self.URL, tag),
+            ('/api/ingredients/', ingredient),
+            (f'/api/ingredients/{ingredient.id}/', ingredient),
+        ):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.captureOnCommitCallbacks(execute=True):
+                    obj.name = f'{obj.name}!'
+                    obj.save()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertIn(obj.name, response.content.decode())
+
+    def test_ingredient_index_expires(self):
+        url = '/api/ingredients/?name=сах'
+        self.assertEqual(self.client.get(url).json(), [])
+        Ingredient.objects.bulk_create([
+            Ingredient(name='сахар', measurement_unit='г')
+        ])
+        self.assertEqual(self.client.get(url).json(), [])
+        later = time.monotonic() + settings.CATALOG_CACHE_TIMEOUT + 1
+        with mock.patch('time.monotonic', return_value=later):
+            response = self.client.get(url)
+        self.assertEqual(
+            [item['name'] for item in response.json()], ['сахар']
+        )
+
+    def test_tag_filter_expires(self):
+        url = '/api/recipes/?tags=dinner'
+        self.assertEqual(self.client.get(url).status_code, 400)
+        Tag.objects.bulk_create([
+            Tag(name='Ужин', color='#FFFFFF', slug='dinner')
+        ])
+        self.assertEqual(self.client.get(url).status_code, 400)
+        later = time.monotonic() + settings.CATALOG_CACHE_TIMEOUT + 1
+        with mock.patch('time.monotonic', return_value=later):
+            self.assertEqual(self.client.get(url).status_code, 200)
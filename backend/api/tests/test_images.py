@@ -0,0 +1,142 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from recipes import images
+from recipes.models import ImageJob, Recipe
+from recipes.versions import get_version, recipe_payload
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    RECIPE_IMAGE_VARIANTS={'thumbnail': 32, 'medium': 64},
+)
+class ImageJobTest(TestCase):
+    """Очередь заданий на копии изображений: переходы состояний и
+    построение копий без пула процессов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Author', last_name='Author', password='pass'
+        )
+        cls.recipe = Recipe.objects.create(
+            name='recipe', author=author, text='text',
+            image='images/omelet.png'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        images.enqueue(self.recipe)
+        self.job = ImageJob.objects.get()
+
+    def save_source(self, name, size=(200, 100)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_enqueue(self):
+        self.assertEqual(self.job.recipe, self.recipe)
+        self.assertEqual(self.job.source, 'images/omelet.png')
+        self.assertEqual(self.job.status, ImageJob.PENDING)
+        self.assertEqual(self.job.attempts, 0)
+
+    def test_claim(self):
+        job, = images.claim(10)
+        self.assertEqual(job.pk, self.job.pk)
+        self.assertEqual(job.status, ImageJob.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        # Задание в работе другой не заберет, пока оно не зависло.
+        self.assertEqual(images.claim(10), [])
+        ImageJob.objects.update(updated=timezone.now() - timedelta(
+            seconds=settings.RECIPE_IMAGE_JOB_TIMEOUT + 1
+        ))
+        job, = images.claim(10)
+        self.assertEqual(job.attempts, 2)
+
+    def test_claim_limit(self):
+        images.enqueue(self.recipe)
+        self.assertEqual(len(images.claim(1)), 1)
+        self.assertEqual(
+            ImageJob.objects.filter(status=ImageJob.PENDING).count(), 1
+        )
+
+    def test_complete(self):
+        job, = images.claim(10)
+        variants = {'thumbnail': {'webp': 'images/variants/omelet.webp'}}
+        version = get_version(recipe_payload(self.recipe.id))
+        images.complete(job, variants)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, variants)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.DONE)
+        self.assertNotEqual(
+            get_version(recipe_payload(self.recipe.id)), version
+        )
+
+    def test_complete_after_image_changed(self):
+        job, = images.claim(10)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image='images/pancake.png'
+        )
+        images.complete(
+            job, {'thumbnail': {'webp': 'images/variants/omelet.webp'}}
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, {})
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.DONE)
+
+    def test_fail(self):
+        for attempt in range(1, settings.RECIPE_IMAGE_JOB_ATTEMPTS + 1):
+            job, = images.claim(10)
+            self.assertEqual(job.attempts, attempt)
+            images.fail(job, OSError('broken'))
+            job.refresh_from_db()
+            self.assertEqual(job.error, 'broken')
+        self.assertEqual(job.status, ImageJob.FAILED)
+        self.assertEqual(images.claim(10), [])
+
+    def test_fail_requeues(self):
+        job, = images.claim(10)
+        images.fail(job, OSError('broken'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImageJob.PENDING)
+
+    def test_render_variants(self):
+        source = self.save_source('images/omelet.png')
+        variants = images.render_variants(source)
+        self.assertEqual(
+            set(variants), set(settings.RECIPE_IMAGE_VARIANTS)
+        )
+        for size, width in settings.RECIPE_IMAGE_VARIANTS.items():
+            self.assertEqual(set(variants[size]), set(images.FORMATS))
+            for extension, format in images.FORMATS.items():
+                name = variants[size][extension]
+                self.assertEqual(
+                    name, images.variant_name(source, size, extension)
+                )
+                with default_storage.open(name) as file:
+                    with Image.open(file) as image:
+                        self.assertEqual(image.format, format)
+                        self.assertEqual(image.size, (width, width // 2))
@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from recipes.models import Ingredient, Tag
+
+
+class ImportDataTest(TestCase):
+    """Загрузка справочников из CSV и JSON командой import_data."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def run_import(self, *paths, **options):
+        stdout = StringIO()
+        call_command(
+            'import_data', *paths, stdout=stdout, batch_size=2, **options
+        )
+        return stdout.getvalue()
+
+    def ingredients(self):
+        return set(Ingredient.objects.values_list('name', 'measurement_unit'))
+
+    def test_csv_without_header(self):
+        path = self.write('ingredients.csv', 'сахар,г\nмука,кг\nсоль,г\n')
+        self.run_import(path)
+        self.assertEqual(
+            self.ingredients(), {('сахар', 'г'), ('мука', 'кг'), ('соль', 'г')}
+        )
+
+    def test_csv_with_header(self):
+        path = self.write(
+            'ingredients.csv', '﻿measurement_unit,name\nг,сахар\n'
+        )
+        self.run_import(path)
+        self.assertEqual(self.ingredients(), {('сахар', 'г')})
+
+    def test_json(self):
+        items = [
+            {'name': 'сахар', 'measurement_unit': 'г'},
+            {'name': 'мука', 'measurement_unit': 'кг'},
+            {'name': 'соль', 'measurement_unit': 'г'},
+        ]
+        expected = {(item['name'], item['measurement_unit']) for item in items}
+        for name, content in (
+            ('ingredients.json', json.dumps(items, ensure_ascii=False)),
+            ('ingredients.jsonl', '\n'.join(
+                json.dumps(item, ensure_ascii=False) for item in items
+            )),
+        ):
+            with self.subTest(name=name):
+                Ingredient.objects.all().delete()
+                self.run_import(self.write(name, content))
+                self.assertEqual(self.ingredients(), expected)
+
+    def test_invalid_json(self):
+        path = self.write('ingredients.json', '[{"name": "сахар"')
+        with self.assertRaises(CommandError):
+            self.run_import(path)
+
+    def test_second_run_idempotent(self):
+        path = self.write(
+            'ingredients.csv', 'сахар,г\nмука,кг\nсахар,г\nсоль,г\n'
+        )
+        self.assertIn('записано 3', self.run_import(path))
+        first = self.ingredients()
+        output = self.run_import(path)
+        self.assertIn('4 строк, записано 0', output)
+        self.assertEqual(self.ingredients(), first)
+        self.assertEqual(Ingredient.objects.count(), 3)
+
+    def test_invalid_rows_skipped(self):
+        path = self.write('ingredients.csv', 'сахар,г\n,кг\nмука,\n')
+        self.assertIn('пропущено 2', self.run_import(path))
+        self.assertEqual(self.ingredients(), {('сахар', 'г')})
+
+    def test_tag_upsert(self):
+        Tag.objects.create(name='Завтрак', color='#000000', slug='breakfast')
+        path = self.write(
+            'tags.csv',
+            'name,color,slug\nутро,#D8BFD8,breakfast\nобед,#FFA07A,lunch\n'
+        )
+        for _ in range(2):
+            self.run_import(path)
+            self.assertEqual(
+                set(Tag.objects.values_list('name', 'color', 'slug')),
+                {('утро', '#D8BFD8', 'breakfast'),
+                 ('обед', '#FFA07A', 'lunch')}
+            )
+
+    def test_catalog_option(self):
+        path = self.write('list.csv', 'ужин,#FFFFFF,dinner\n')
+        with self.assertRaises(CommandError):
+            self.run_import(path)
+        self.run_import(path, catalog='tags')
+        self.assertTrue(Tag.objects.filter(slug='dinner').exists())
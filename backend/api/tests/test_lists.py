@@ -0,0 +1,312 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.forms import modelform_factory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from api.serializers import RecipeWriteSerializer
+from recipes import lists
+from recipes.models import (Amount, Favorite, Ingredient, Recipe,
+                            ShoppingCart, ShoppingCartTotal)
+
+User = get_user_model()
+
+
+class ListsTestCase(APITestCase):
+    """Рецепты с ингредиентами и сверка итогов корзины с подсчетом
+    по корзине заново."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Reader', last_name='Reader', password='pass'
+        )
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Author', last_name='Author', password='pass'
+        )
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{i}', measurement_unit='г'
+            ) for i in range(4)
+        ]
+        cls.recipes = []
+        for i in range(4):
+            recipe = Recipe.objects.create(
+                name=f'recipe{i}', author=cls.author, text='text'
+            )
+            Amount.objects.bulk_create(
+                Amount(recipe=recipe, ingredient=ingredient, amount=i + 1)
+                for ingredient in cls.ingredients[i:i + 2]
+            )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def assert_totals(self, user=None):
+        user = user or self.user
+        expected = dict(
+            Amount.objects
+            .filter(recipe__in_shopping_cart__user=user)
+            .values('ingredient_id')
+            .annotate(total=Sum('amount'))
+            .values_list('ingredient_id', 'total')
+        )
+        actual = dict(
+            ShoppingCartTotal.objects.filter(user=user)
+            .values_list('ingredient_id', 'amount')
+        )
+        self.assertEqual(actual, expected)
+
+    def assert_counters(self):
+        for recipe in Recipe.objects.all():
+            self.assertEqual(
+                recipe.favorites_count,
+                Favorite.objects.filter(recipe=recipe).count()
+            )
+            self.assertEqual(
+                recipe.carts_count,
+                ShoppingCart.objects.filter(recipe=recipe).count()
+            )
+
+
+class BulkChangeTest(ListsTestCase):
+    """Отчет массовых изменений и счетчики только по измененным строкам."""
+
+    CART_URL = '/api/recipes/shopping_cart/'
+    FAVORITE_URL = '/api/recipes/favorite/'
+
+    def test_report(self):
+        first, second, third = (recipe.id for recipe in self.recipes[:3])
+        missing = self.recipes[-1].id + 1
+        self.client.post(f'/api/recipes/{first}/shopping_cart/')
+        response = self.client.post(self.CART_URL, {
+            'recipes': [first, second, missing, second, third]
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data, {
+            'applied': [second, third], 'skipped': [first],
+            'missing': [missing],
+        })
+        self.assert_counters()
+        self.assert_totals()
+        response = self.client.delete(
+            self.CART_URL, {'recipes': [first, self.recipes[3].id]},
+            format='json'
+        )
+        self.assertEqual(response.data, {
+            'applied': [first], 'skipped': [self.recipes[3].id],
+            'missing': [],
+        })
+        self.assertEqual(
+            set(self.user.cart.values_list('recipe_id', flat=True)),
+            {second, third}
+        )
+        self.assert_counters()
+        self.assert_totals()
+
+    def test_concurrent_toggle_not_counted_twice(self):
+        recipe_id = self.recipes[0].id
+        add_many = lists.add_many
+
+        def add_after_toggle(model, user_id, recipe_ids):
+            # Одиночное добавление успело раньше массового.
+            lists.add(model, user_id, recipe_id)
+            return add_many(model, user_id, recipe_ids)
+
+        with mock.patch.object(lists, 'add_many', add_after_toggle):
+            response = self.client.post(
+                self.FAVORITE_URL, {'recipes': [recipe_id]}, format='json'
+            )
+        self.assertEqual(response.data['applied'], [])
+        self.assertEqual(response.data['skipped'], [recipe_id])
+        self.assert_counters()
+
+
+class ShoppingCartTotalsTest(ListsTestCase):
+    """Итоги корзины после каждого изменения совпадают с подсчетом
+    по корзине заново."""
+
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(
+            email='other@example.com', username='other',
+            first_name='Other', last_name='Other', password='pass'
+        )
+        for recipe in self.recipes[:3]:
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.client.force_authenticate(self.other)
+        for recipe in self.recipes[1:]:
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.client.force_authenticate(self.user)
+
+    def assert_all_totals(self):
+        self.assert_totals(self.user)
+        self.assert_totals(self.other)
+
+    def test_cart_add_and_remove(self):
+        self.assert_all_totals()
+        url = f'/api/recipes/{self.recipes[1].id}/shopping_cart/'
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assert_all_totals()
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assert_all_totals()
+
+    def test_ingredients_patch(self):
+        recipe = self.recipes[1]
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(f'/api/recipes/{recipe.id}/', {
+            'ingredients': [
+                {'id': self.ingredients[1].id, 'amount': 10},
+                {'id': self.ingredients[3].id, 'amount': 7},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assert_all_totals()
+
+    def test_recipe_delete(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(f'/api/recipes/{self.recipes[2].id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_all_totals()
+
+    def test_rebuild(self):
+        ShoppingCartTotal.objects.filter(user=self.user).update(amount=999)
+        ShoppingCartTotal.objects.filter(user=self.other).delete()
+        call_command('rebuild_cart_totals', stdout=StringIO())
+        self.assert_all_totals()
+
+
+class RecipeIngredientsUpdateTest(ListsTestCase):
+    """PATCH меняет только отличающиеся строки состава рецепта."""
+
+    WRITES = ('INSERT', 'UPDATE', 'DELETE')
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+        self.recipe = self.recipes[1]
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def amount_writes(self, data):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(self.WRITES)
+            and '"recipes_amount"' in query['sql']
+        ]
+
+    def test_unchanged_ingredients(self):
+        self.assertEqual(self.amount_writes({'name': 'Новое название'}), [])
+        current = [
+            {'id': ingredient_id, 'amount': amount}
+            for ingredient_id, amount in self.recipe.ingredients
+            .values_list('ingredient_id', 'amount')
+        ]
+        self.assertEqual(self.amount_writes({'ingredients': current}), [])
+
+    def test_mixed_diff(self):
+        kept, changed, removed = self.ingredients[0], *self.ingredients[1:3]
+        added = self.ingredients[3]
+        Amount.objects.create(recipe=self.recipe, ingredient=kept, amount=5)
+        writes = self.amount_writes({'ingredients': [
+            {'id': kept.id, 'amount': 5},
+            {'id': changed.id, 'amount': 50},
+            {'id': added.id, 'amount': 7},
+        ]})
+        # Удаление, вставка и изменение — по одному запросу.
+        self.assertEqual(len(writes), 3, writes)
+        self.assertEqual(
+            dict(self.recipe.ingredients.values_list(
+                'ingredient_id', 'amount'
+            )),
+            {kept.id: 5, changed.id: 50, added.id: 7}
+        )
+        self.assertFalse(
+            self.recipe.ingredients.filter(ingredient=removed).exists()
+        )
+
+
+class RecipeIngredientsValidationTest(ListsTestCase):
+    """Ошибки состава рецепта возвращаются по позициям до любой записи,
+    а ингредиенты проверяются одним запросом."""
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+        self.recipe = self.recipes[1]
+        self.url = f'/api/recipes/{self.recipe.id}/'
+
+    def patch_invalid(self, ingredients):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(self.url, {
+                'name': 'Новое название', 'ingredients': ingredients,
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ['ingredients'])
+        writes = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+        ]
+        self.assertEqual(writes, [])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'recipe1')
+        return response.data['ingredients']
+
+    def test_errors_by_index(self):
+        first = self.ingredients[0].id
+        missing = self.ingredients[-1].id + 1
+        errors = self.patch_invalid([
+            {'id': first, 'amount': 1},
+            {'id': missing, 'amount': 1},
+            {'id': first, 'amount': 2},
+        ])
+        self.assertEqual(errors, [
+            {},
+            {'id': [f'Ингредиента с id={missing} нет.']},
+            {'id': ['Нельзя дублировать имена ингредиентов.']},
+        ])
+
+    def test_non_positive_amount(self):
+        errors = self.patch_invalid([
+            {'id': self.ingredients[0].id, 'amount': 1},
+            {'id': self.ingredients[1].id, 'amount': 0},
+            {'id': self.ingredients[2].id, 'amount': -3},
+        ])
+        self.assertEqual(errors[0], {})
+        self.assertEqual(list(errors[1]), ['amount'])
+        self.assertEqual(list(errors[2]), ['amount'])
+
+    def test_lookup_query_budget(self):
+        serializer = RecipeWriteSerializer(
+            self.recipe, partial=True, data={'ingredients': [
+                {'id': ingredient.id, 'amount': 1}
+                for ingredient in self.ingredients
+            ]}
+        )
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+
+class RecipeAuthorChangeTest(ListsTestCase):
+    """Смена автора в админке пересчитывает число рецептов авторов."""
+
+    def test_admin_author_change(self):
+        recipe = self.recipes[0]
+        model_admin = admin.site._registry[Recipe]
+        form = modelform_factory(Recipe, fields=('author', ))(
+            {'author': self.user.id}, instance=recipe
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        model_admin.save_model(None, form.save(commit=False), form, True)
+        for user, count in ((self.author, 3), (self.user, 1)):
+            user.refresh_from_db()
+            self.assertEqual(user.recipes_count, count)
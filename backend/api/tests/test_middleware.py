@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import RequestFactory, modify_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from api.middleware import (DatabaseStatsMiddleware, QueryStats,
+                            fingerprint, logger)
+from recipes import totals
+from recipes.models import Amount, Ingredient, Recipe, ShoppingCart
+
+User = get_user_model()
+
+
+@modify_settings(MIDDLEWARE={
+    'prepend': 'api.middleware.DatabaseStatsMiddleware',
+})
+class DatabaseStatsMiddlewareTest(APITestCase):
+    """Заголовки X-DB-Queries и X-DB-Time, выборка и лог медленных
+    запросов. Middleware создается при первом запросе клиента, поэтому
+    настройки меняются до него."""
+
+    LOGGER = 'foodgram.db'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Reader', last_name='Reader', password='pass'
+        )
+        ingredient = Ingredient.objects.create(
+            name='сахар', measurement_unit='г'
+        )
+        recipe = Recipe.objects.create(
+            name='recipe', author=cls.user, text='text'
+        )
+        Amount.objects.create(recipe=recipe, ingredient=ingredient, amount=5)
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        totals.add_recipes(cls.user.id, [recipe.id])
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_headers(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['X-DB-Queries']), len(context))
+        self.assertGreaterEqual(float(response['X-DB-Time']), 0)
+
+    def test_not_sampled(self):
+        with self.settings(DB_STATS_SAMPLE_RATE=0):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-DB-Queries', response)
+        self.assertNotIn('X-DB-Time', response)
+
+    def test_fast_request_not_logged(self):
+        with mock.patch.object(logger, 'warning') as warning:
+            self.client.get('/api/recipes/')
+        warning.assert_not_called()
+
+    def test_slow_request_logged(self):
+        with self.settings(DB_STATS_SLOW_REQUEST_MS=0):
+            with self.assertLogs(self.LOGGER, 'WARNING') as logs:
+                response = self.client.get('/api/recipes/')
+        message, = logs.output
+        self.assertIn('GET /api/recipes/', message)
+        self.assertIn(
+            f'запросов к БД {response["X-DB-Queries"]} ', message
+        )
+
+    def test_streamed_queries_logged(self):
+        url = '/api/recipes/download_shopping_cart/'
+        with self.settings(DB_STATS_SLOW_REQUEST_MS=0):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+                with self.assertLogs(self.LOGGER, 'WARNING') as logs:
+                    content = b''.join(response.streaming_content)
+        self.assertIn('сахар'.encode(), content)
+        # Итоги читаются уже при отдаче тела: в заголовки они не попали,
+        # в лог — попали.
+        self.assertLess(int(response['X-DB-Queries']), len(context))
+        message, = logs.output
+        self.assertIn(f'запросов к БД {len(context)} ', message)
+
+    def test_repeated_queries_logged_by_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT  * FROM t\nWHERE id IN (%s, %s) LIMIT 10'),
+            'SELECT * FROM t WHERE id IN (...) LIMIT ?'
+        )
+        stats = QueryStats()
+        for sql in (
+            'SELECT * FROM t WHERE id IN (%s, %s) LIMIT 10',
+            'SELECT * FROM t WHERE id IN (%s, %s, %s) LIMIT 20',
+            'SELECT 1',
+        ):
+            stats(lambda *args: None, sql, [], False, {})
+        self.assertEqual(stats.count, 3)
+        middleware = DatabaseStatsMiddleware(get_response=None)
+        request = RequestFactory().get('/api/recipes/')
+        with self.assertLogs(self.LOGGER, 'WARNING') as logs:
+            middleware.log_slow_request(request, 1.0, stats)
+        lines = logs.records[0].getMessage().splitlines()
+        self.assertEqual(
+            lines[1:], ['  2x SELECT * FROM t WHERE id IN (...) LIMIT ?']
+        )
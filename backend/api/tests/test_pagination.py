@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+
+class CursorPaginationTest(APITestCase):
+    """Навигация по ключу (?cursor=): ссылки next и previous без
+    подсчета записей и стабильный порядок между страницами."""
+
+    RECIPES_URL = '/api/recipes/'
+    SUBSCRIPTIONS_URL = '/api/users/subscriptions/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Reader', last_name='Reader', password='pass'
+        )
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                first_name='Author', last_name='Author', password='pass'
+            ) for i in range(5)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+        now = timezone.now()
+        for i in range(7):
+            recipe = Recipe.objects.create(
+                name=f'recipe{i}', author=cls.authors[i % 5], text='text'
+            )
+            # Одинаковое время публикации у нескольких рецептов: порядок
+            # внутри них задает id.
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(minutes=i // 3)
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def get_page(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        counts = [
+            query['sql'] for query in context.captured_queries
+            if 'COUNT(' in query['sql'].upper()
+        ]
+        self.assertEqual(counts, [])
+        self.assertNotIn('count', response.data)
+        return response.data
+
+    def walk(self, url, key):
+        """Значения key по всем страницам вперед и затем назад."""
+        pages = []
+        data = self.get_page(url)
+        pages.append([item[key] for item in data['results']])
+        self.assertIsNone(data['previous'])
+        while data['next']:
+            data = self.get_page(data['next'])
+            pages.append([item[key] for item in data['results']])
+        backward = [pages[-1]]
+        while data['previous']:
+            data = self.get_page(data['previous'])
+            backward.append([item[key] for item in data['results']])
+        self.assertEqual(backward[::-1], pages)
+        return pages
+
+    def test_recipes(self):
+        pages = self.walk(f'{self.RECIPES_URL}?cursor=&limit=3', 'id')
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(
+            [recipe_id for page in pages for recipe_id in page],
+            list(
+                Recipe.objects.order_by('-pub_date', '-id')
+                .values_list('id', flat=True)
+            )
+        )
+
+    def test_subscriptions(self):
+        pages = self.walk(
+            f'{self.SUBSCRIPTIONS_URL}?cursor=&limit=2', 'username'
+        )
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(
+            [username for page in pages for username in page],
+            sorted(author.username for author in self.authors)
+        )
+
+    def test_invalid_cursor(self):
+        for url in (self.RECIPES_URL, self.SUBSCRIPTIONS_URL):
+            with self.subTest(url=url):
+                response = self.client.get(f'{url}?cursor=invalid')
+                self.assertEqual(response.status_code, 404)
+
+    def test_page_number_mode_unchanged(self):
+        response = self.client.get(f'{self.RECIPES_URL}?limit=3')
+        self.assertEqual(response.data['count'], 7)
@@ -0,0 +1,303 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from recipes.models import (Amount, Favorite, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from recipes.versions import RECIPES, get_version, recipe_payload
+from users.models import Follow
+
+User = get_user_model()
+
+
+class RecipeQueryBudgetTest(APITestCase):
+    """Число запросов к БД не зависит от размера страницы рецептов."""
+
+    LIST_URL = '/api/recipes/'
+    PAGE_SIZES = (1, 100)
+    LIST_BUDGET = 6
+    DETAIL_BUDGET = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Reader', last_name='Reader', password='pass'
+        )
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                first_name='Author', last_name='Author', password='pass'
+            ) for i in range(3)
+        ]
+        Follow.objects.create(user=cls.user, author=cls.authors[0])
+        cls.tags = [
+            Tag.objects.create(
+                name=f'tag{i}', color=f'#00000{i}', slug=f'tag{i}'
+            ) for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{i}', measurement_unit='г'
+            ) for i in range(5)
+        ]
+        for i in range(max(cls.PAGE_SIZES)):
+            recipe = Recipe.objects.create(
+                name=f'recipe{i}',
+                author=cls.authors[i % len(cls.authors)],
+                text='text',
+                cooking_time=10,
+            )
+            recipe.tags.add(*cls.tags[:i % len(cls.tags) + 1])
+            Amount.objects.bulk_create(
+                Amount(recipe=recipe, ingredient=ingredient, amount=i + 1)
+                for ingredient in cls.ingredients[:3]
+            )
+            if i % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if i % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        cls.recipe = Recipe.objects.first()
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return len(context)
+
+    def assert_constant_list_queries(self, query='', budget=LIST_BUDGET):
+        counts = [
+            self.count_queries(f'{self.LIST_URL}?limit={size}{query}')
+            for size in self.PAGE_SIZES
+        ]
+        self.assertEqual(len(set(counts)), 1, counts)
+        self.assertLessEqual(counts[0], budget)
+
+    def test_list_anonymous(self):
+        self.assert_constant_list_queries()
+
+    def test_list_authenticated(self):
+        self.client.force_authenticate(self.user)
+        self.assert_constant_list_queries()
+
+    def test_list_filtered(self):
+        self.client.force_authenticate(self.user)
+        self.assert_constant_list_queries('&is_favorited=1&tags=tag0')
+        self.assert_constant_list_queries('&is_in_shopping_cart=1')
+
+    def test_tags_filter_distinct(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                f'{self.LIST_URL}?limit=100&tags=tag0&tags=tag1'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        ids = [item['id'] for item in response.data['results']]
+        expected = Recipe.objects.filter(
+            tags__slug__in=('tag0', 'tag1')
+        ).distinct().count()
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(response.data['count'], expected)
+        self.assertEqual(len(ids), expected)
+        self.assertFalse(any(
+            'DISTINCT' in query['sql'] for query in context.captured_queries
+        ))
+        response = self.client.get(f'{self.LIST_URL}?tags=unknown')
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail(self):
+        url = f'{self.LIST_URL}{self.recipe.id}/'
+        self.assertLessEqual(self.count_queries(url), self.DETAIL_BUDGET)
+        self.client.force_authenticate(self.user)
+        self.assertLessEqual(self.count_queries(url), self.DETAIL_BUDGET)
+
+    def test_count_cached_until_lists_change(self):
+        self.client.force_authenticate(self.user)
+        url = f'{self.LIST_URL}?is_favorited=1'
+        cold = self.count_queries(url)
+        # Повторно не считаются количество, теги и ингредиенты.
+        with self.assertNumQueries(cold - 3):
+            response = self.client.get(url)
+        self.assertEqual(
+            response.data['count'], self.user.favorites.count()
+        )
+        self.client.delete(f'{self.LIST_URL}{self.recipe.id}/favorite/')
+        self.client.post(f'{self.LIST_URL}{self.recipe.id}/favorite/')
+        with self.assertNumQueries(cold - 2):
+            self.client.get(url)
+
+    def test_count_version_bumped_on_commit(self):
+        before = get_version(RECIPES)
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(
+                name='Новый рецепт', author=self.authors[0], text='text'
+            )
+            self.assertEqual(get_version(RECIPES), before)
+        self.assertNotEqual(get_version(RECIPES), before)
+
+    def test_payload_cached_until_recipe_changes(self):
+        url = f'{self.LIST_URL}{self.recipe.id}/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Новое название'
+            self.recipe.save()
+            self.recipe.author.first_name = 'Новое имя'
+            self.recipe.author.save()
+        self.client.force_authenticate(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.data['name'], 'Новое название')
+        self.assertEqual(
+            response.data['author']['first_name'], 'Новое имя'
+        )
+        self.assertEqual(
+            response.data['author']['is_subscribed'],
+            self.user.follower.filter(author=self.recipe.author).exists()
+        )
+
+    def test_payload_version_bumped_on_delete(self):
+        recipe = Recipe.objects.create(
+            name='Удаляемый рецепт', author=self.authors[0], text='text'
+        )
+        name = recipe_payload(recipe.id)
+        before = get_version(name)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertNotEqual(get_version(name), before)
+
+    def test_payload_follows_image_variants(self):
+        # Обработчик изображений пишет в БД из другого процесса, версия
+        # рецепта в кэше веб-сервера не меняется.
+        cache.clear()
+        url = f'{self.LIST_URL}{self.recipe.id}/'
+        recipes = Recipe.objects.filter(pk=self.recipe.pk)
+        recipes.update(image='images/probe.png')
+        images = self.client.get(url).data['images']
+        self.assertTrue(images['thumbnail']['webp'].endswith('probe.png'))
+        recipes.update(image_variants={
+            'thumbnail': {'webp': 'images/variants/probe_thumbnail.webp'}
+        })
+        images = self.client.get(url).data['images']
+        self.assertTrue(
+            images['thumbnail']['webp'].endswith('probe_thumbnail.webp')
+        )
+
+    def test_local_payload_expires(self):
+        cache.clear()
+        url = f'{self.LIST_URL}{self.recipe.id}/'
+        self.client.get(url)
+        # Запись из другого процесса: версия в этом процессе не меняется.
+        Recipe.objects.filter(pk=self.recipe.pk).update(name='Новое название')
+        self.assertEqual(self.client.get(url).data['name'], self.recipe.name)
+        later = time.monotonic() + settings.RECIPE_LOCAL_CACHE_TIMEOUT + 1
+        with mock.patch('api.cache.time.monotonic', return_value=later):
+            response = self.client.get(url)
+        self.assertEqual(response.data['name'], 'Новое название')
+
+    def test_favorite_toggle(self):
+        self.client.force_authenticate(self.authors[0])
+        url = f'{self.LIST_URL}{self.recipe.id}/favorite/'
+        favorites_count = self.recipe.favorites_count
+        response = self.assert_list_statements(self.client.post, url)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['name'], self.recipe.name)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(
+            self.client.post(f'{self.LIST_URL}0/favorite/').status_code, 404
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, favorites_count + 1)
+        response = self.assert_list_statements(self.client.delete, url)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, favorites_count)
+
+    def assert_list_statements(self, method, url):
+        """Изменение списка и счетчик рецепта: на PostgreSQL один
+        запрос, на SQLite — два. Управление транзакцией не считается."""
+        with CaptureQueriesContext(connection) as context:
+            response = method(url)
+        statements = [
+            query['sql'] for query in context.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE', 'BEGIN'))
+        ]
+        expected = 1 if connection.vendor == 'postgresql' else 2
+        self.assertEqual(len(statements), expected, statements)
+        return response
+
+    def test_flags_match_relations(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(f'{self.LIST_URL}?limit=100')
+        favorites = set(
+            self.user.favorites.values_list('recipe_id', flat=True)
+        )
+        cart = set(self.user.cart.values_list('recipe_id', flat=True))
+        for item in response.data['results']:
+            self.assertEqual(item['is_favorited'], item['id'] in favorites)
+            self.assertEqual(
+                item['is_in_shopping_cart'], item['id'] in cart
+            )
+            self.assertEqual(
+                item['author']['is_subscribed'],
+                item['author']['id'] == self.authors[0].id
+            )
+
+
+class SubscriptionsQueryBudgetTest(APITestCase):
+    """Подписки отдаются за постоянное число запросов."""
+
+    URL = '/api/users/subscriptions/'
+    BUDGET = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Reader', last_name='Reader', password='pass'
+        )
+        for i in range(20):
+            author = User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i:02}',
+                first_name='Author', last_name='Author', password='pass'
+            )
+            Follow.objects.create(user=cls.user, author=author)
+            for j in range(i % 5):
+                Recipe.objects.create(
+                    name=f'recipe{i}-{j}', author=author, text='text'
+                )
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_constant_queries(self):
+        for limit in (1, 20):
+            with self.assertNumQueries(self.BUDGET):
+                response = self.client.get(
+                    f'{self.URL}?limit={limit}&recipes_limit=2'
+                )
+            self.assertEqual(response.status_code, 200)
+
+    def test_recipes_limit(self):
+        response = self.client.get(f'{self.URL}?limit=20&recipes_limit=2')
+        for item in response.data['results']:
+            author = User.objects.get(id=item['id'])
+            expected = list(
+                author.recipes.values_list('id', flat=True)[:2]
+            )
+            self.assertTrue(item['is_subscribed'])
+            self.assertEqual(item['recipes_count'], author.recipes.count())
+            self.assertEqual(
+                [recipe['id'] for recipe in item['recipes']], expected
+            )
+
+    def test_without_recipes_limit(self):
+        response = self.client.get(f'{self.URL}?limit=20')
+        for item in response.data['results']:
+            self.assertEqual(len(item['recipes']), item['recipes_count'])
@@ -0,0 +1,134 @@
+import json
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from api.management.commands.benchmark import ENDPOINTS, Command
+from recipes.models import (Amount, Favorite, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+# Таблицы, которые растут вместе с данными пользователей. Справочник
+# тегов и служебные таблицы можно читать целиком.
+LARGE_TABLES = {
+    'recipes_recipe', 'recipes_recipe_tags', 'recipes_amount',
+    'recipes_ingredient', 'recipes_favorite', 'recipes_shoppingcart',
+    'recipes_shoppingcarttotal', 'users_user', 'users_follow',
+}
+EXPLAINED = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+
+def walk(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from walk(child)
+
+
+def full_scans(node, indexes=False):
+    """Большие таблицы, которые узел читает целиком: Seq Scan, а при
+    indexes=True и обход индекса без условия."""
+    return [
+        child['Relation Name'] for child in walk(node)
+        if child.get('Relation Name') in LARGE_TABLES and (
+            child['Node Type'] == 'Seq Scan'
+            or indexes and 'Index Cond' not in child
+            and child['Node Type'] in ('Index Scan', 'Index Only Scan')
+        )
+    ]
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Планы проверяются на '
+            'PostgreSQL.')
+class QueryPlanTest(APITestCase):
+    """Запросы эндпоинтов не читают большие таблицы последовательно и
+    не сортируют их целиком. На маленьких тестовых таблицах планировщик
+    предпочел бы Seq Scan, поэтому он отключается: если Seq Scan все
+    равно остался, подходящего индекса нет."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Reader', last_name='Reader', password='pass'
+        )
+        authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                first_name='Author', last_name='Author', password='pass'
+            ) for i in range(3)
+        ]
+        for author in authors[:2]:
+            Follow.objects.create(user=cls.user, author=author)
+        tags = [
+            Tag.objects.create(
+                name=f'tag{i}', color=f'#00000{i}', slug=f'tag{i}'
+            ) for i in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient{i}', measurement_unit='г'
+            ) for i in range(5)
+        ]
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {i}', author=authors[i % len(authors)],
+                text='text', cooking_time=10,
+            )
+            recipe.tags.add(*tags[:i % len(tags) + 1])
+            Amount.objects.bulk_create(
+                Amount(recipe=recipe, ingredient=ingredient, amount=i + 1)
+                for ingredient in ingredients[:3]
+            )
+            if i % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if i % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']
+
+    def capture(self, url, auth, methods):
+        if auth:
+            self.client.force_authenticate(self.user)
+        else:
+            self.client.force_authenticate(None)
+        statements = []
+        for method in methods:
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(self.client, method)(url)
+            self.assertLess(response.status_code, 400, url)
+            statements += [
+                query['sql'] for query in context.captured_queries
+                if query['sql'].lstrip().upper().startswith(EXPLAINED)
+            ]
+        return statements
+
+    def test_no_full_scans(self):
+        params = Command().get_params(self.user)
+        with connection.cursor() as cursor:
+            # До конца тестовой транзакции.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for name, url, auth, methods in ENDPOINTS:
+            for sql in self.capture(url.format(**params), auth, methods):
+                plan = self.explain(sql)
+                with self.subTest(endpoint=name, sql=sql):
+                    self.assertEqual(full_scans(plan), [])
+                    # Сортировка выборки по индексу допустима, сортировка
+                    # всей таблицы — нет.
+                    for node in walk(plan):
+                        if node['Node Type'] == 'Sort':
+                            self.assertEqual(
+                                full_scans(node, indexes=True), []
+                            )
@@ -0,0 +1,53 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from recipes.models import Tag
+
+User = get_user_model()
+
+REPLICA = next(iter(settings.DATABASE_REPLICAS), None)
+
+
+@skipUnless(
+    REPLICA and not settings.DATABASES[REPLICA].get('TEST', {}).get('MIRROR'),
+    'Нужна отдельная реплика, например DB_ENGINE=sqlite3 '
+    'DB_REPLICAS=db_replica.sqlite3.'
+)
+class ReplicaRoutingTest(APITestCase):
+    """Чтение из реплики, запись и чтение после записи — из основной БД."""
+
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        Tag.objects.create(name='Основная', color='#000000', slug='primary')
+        Tag.objects.using(REPLICA).create(
+            name='Реплика', color='#FFFFFF', slug='replica'
+        )
+
+    def get_slugs(self, address, page):
+        # Разные адреса, чтобы не попасть в кэш ответов справочника.
+        response = self.client.get(
+            f'/api/tags/?page={page}', REMOTE_ADDR=address
+        )
+        self.assertEqual(response.status_code, 200)
+        return [tag['slug'] for tag in response.json()]
+
+    def test_read_your_writes(self):
+        self.assertEqual(self.get_slugs('10.0.0.1', 1), ['replica'])
+        response = self.client.post('/api/users/', {
+            'email': 'new@example.com', 'username': 'new',
+            'first_name': 'New', 'last_name': 'User',
+            'password': 'new-Password-123',
+        }, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(User.objects.filter(username='new').exists())
+        self.assertFalse(
+            User.objects.using(REPLICA).filter(username='new').exists()
+        )
+        self.assertEqual(self.get_slugs('10.0.0.1', 2), ['primary'])
+        self.assertEqual(self.get_slugs('10.0.0.2', 3), ['replica'])
@@ -0,0 +1,105 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from rest_framework.test import APITestCase
+
+from recipes.models import Amount, Ingredient, Recipe
+from recipes.search import FTS_TABLE, index_recipes, search_recipes
+
+User = get_user_model()
+
+
+class RecipeSearchTest(APITestCase):
+    """Поиск ?search= по названию, ингредиентам и описанию и
+    обновление поискового индекса при изменении рецептов."""
+
+    URL = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Author', last_name='Author', password='pass'
+        )
+        sorrel = Ingredient.objects.create(
+            name='щавель', measurement_unit='г'
+        )
+        potato = Ingredient.objects.create(
+            name='картофель', measurement_unit='г'
+        )
+        cls.by_text = Recipe.objects.create(
+            name='Зеленые щи', author=cls.author,
+            text='В конце добавить щавель и яйцо.'
+        )
+        cls.by_ingredient = Recipe.objects.create(
+            name='Весенний суп', author=cls.author, text='Варить 20 минут.'
+        )
+        cls.by_name = Recipe.objects.create(
+            name='Щавель тушеный', author=cls.author, text='Тушить 5 минут.'
+        )
+        Amount.objects.create(
+            recipe=cls.by_ingredient, ingredient=sorrel, amount=100
+        )
+        Amount.objects.create(
+            recipe=cls.by_text, ingredient=potato, amount=200
+        )
+        index_recipes(Recipe.objects.values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.author)
+
+    def search(self, query):
+        response = self.client.get(self.URL, {'search': query, 'limit': 10})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [item['id'] for item in response.data['results']]
+
+    def test_ranking(self):
+        self.assertEqual(self.search('щавель'), [
+            self.by_name.id, self.by_ingredient.id, self.by_text.id
+        ])
+        self.assertEqual(self.search('картофель'), [self.by_text.id])
+        self.assertEqual(self.search('ананас'), [])
+
+    def test_rename_reindexes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'{self.URL}{self.by_name.id}/',
+                {'name': 'Шпинат тушеный'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertNotIn(self.by_name.id, self.search('щавель'))
+        self.assertEqual(self.search('шпинат'), [self.by_name.id])
+
+    def test_delete_unindexes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(
+                f'{self.URL}{self.by_ingredient.id}/'
+            )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(
+            self.search('щавель'), [self.by_name.id, self.by_text.id]
+        )
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT count(*) FROM {FTS_TABLE} WHERE rowid = %s',
+                    [self.by_ingredient.id]
+                )
+                self.assertEqual(cursor.fetchone()[0], 0)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Ранжирование FTS5.')
+    def test_sqlite_rank_computed_once(self):
+        # Ранги всех совпадений считаются один раз и ищутся по индексу,
+        # а не через MATCH заново для каждой строки.
+        queryset = search_recipes(Recipe.objects.all(), 'щавель')
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertIn('CO-ROUTINE ranked', plan)
+        self.assertTrue(
+            any(step.startswith('SEARCH ranked') for step in plan), plan
+        )
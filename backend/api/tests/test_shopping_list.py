@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from rest_framework.test import APITestCase
+
+from recipes import totals
+from recipes.models import Amount, Ingredient, Recipe, ShoppingCart
+
+User = get_user_model()
+
+
+class DownloadShoppingCartTest(APITestCase):
+    """Список покупок отдается потоком в txt, csv и json."""
+
+    URL = '/api/recipes/download_shopping_cart/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Reader', last_name='Reader', password='pass'
+        )
+        sugar, flour, salt = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('сахар', 'г'), ('мука', 'кг'), ('соль', 'г'))
+        )
+        for i, ingredients in enumerate(((sugar, flour), (sugar, salt))):
+            recipe = Recipe.objects.create(
+                name=f'recipe{i}', author=cls.user, text='text'
+            )
+            Amount.objects.bulk_create(
+                Amount(recipe=recipe, ingredient=ingredient, amount=i + 2)
+                for ingredient in ingredients
+            )
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+            totals.add_recipes(cls.user.id, [recipe.id])
+        cls.rows = [('мука', 'кг', 2), ('сахар', 'г', 5), ('соль', 'г', 3)]
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def download(self, format=None):
+        url = self.URL if format is None else f'{self.URL}?format={format}'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def baseline(self, user):
+        """Ответ до перехода на потоковую отдачу."""
+        ingredients = (
+            Amount.objects
+            .filter(recipe__in_shopping_cart__user=user)
+            .values('ingredient')
+            .annotate(total_amount=Sum('amount'))
+            .order_by('ingredient__name')
+            .values_list('ingredient__name',
+                         'ingredient__measurement_unit',
+                         'total_amount'
+                         )
+        )
+        return 'Cписок покупок:\n' + '\n'.join(
+            '{} ({}) — {}'.format(*ingredient) for ingredient in ingredients
+        )
+
+    def assert_attachment(self, response, format, content_type):
+        self.assertEqual(
+            response['Content-Type'], f'{content_type}; charset=utf-8'
+        )
+        self.assertEqual(
+            response['Content-Disposition'],
+            f'attachment; filename="shopping_cart.{format}"'
+        )
+
+    def test_txt(self):
+        for format in (None, 'txt'):
+            with self.subTest(format=format):
+                response, content = self.download(format)
+                self.assert_attachment(response, 'txt', 'text/plain')
+                self.assertEqual(content, self.baseline(self.user))
+                self.assertEqual(content, (
+                    'Cписок покупок:\n'
+                    'мука (кг) — 2\nсахар (г) — 5\nсоль (г) — 3'
+                ))
+
+    def test_csv(self):
+        response, content = self.download('csv')
+        self.assert_attachment(response, 'csv', 'text/csv')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(
+            rows[0], ['Ингредиент', 'Единица измерения', 'Количество']
+        )
+        self.assertEqual(
+            rows[1:], [[str(value) for value in row] for row in self.rows]
+        )
+
+    def test_json(self):
+        response, content = self.download('json')
+        self.assert_attachment(response, 'json', 'application/json')
+        self.assertEqual(json.loads(content), [
+            {'name': name, 'measurement_unit': unit, 'amount': amount}
+            for name, unit, amount in self.rows
+        ])
+
+    def test_empty_cart(self):
+        other = User.objects.create_user(
+            email='other@example.com', username='other',
+            first_name='Other', last_name='Other', password='pass'
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.download('txt')[1], self.baseline(other))
+        self.assertEqual(self.download('txt')[1], 'Cписок покупок:\n')
+        rows = list(csv.reader(io.StringIO(self.download('csv')[1])))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(json.loads(self.download('json')[1]), [])
+
+    def test_unknown_format(self):
+        response = self.client.get(f'{self.URL}?format=xml')
+        self.assertEqual(response.status_code, 404)
+
+    def test_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.URL).status_code, 401)
@@ -0,0 +1,130 @@
+import base64
+import io
+import json
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_png(size=(20, 20)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeUploadTest(APITestCase):
+    """Создание рецепта с изображением файлом multipart/form-data и
+    строкой base64, ограничения размера изображения."""
+
+    URL = '/api/recipes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Author', last_name='Author', password='pass'
+        )
+        cls.tag = Tag.objects.create(
+            name='Завтрак', color='#000000', slug='breakfast'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='сахар', measurement_unit='г'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+
+    def post_multipart(self, image):
+        return self.client.post(self.URL, {
+            'name': 'Омлет',
+            'text': 'text',
+            'cooking_time': 10,
+            'tags': json.dumps([self.tag.id]),
+            'ingredients': json.dumps(
+                [{'id': self.ingredient.id, 'amount': 3}]
+            ),
+            'image': SimpleUploadedFile('omelet.png', image, 'image/png'),
+        }, format='multipart')
+
+    def assert_created(self, response):
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get()
+        self.assertEqual(list(recipe.tags.all()), [self.tag])
+        self.assertEqual(
+            list(recipe.ingredients.values_list('ingredient_id', 'amount')),
+            [(self.ingredient.id, 3)]
+        )
+        self.assertTrue(recipe.image.name.endswith('.png'))
+        with recipe.image.open() as file, Image.open(file) as image:
+            self.assertEqual(image.size, (20, 20))
+
+    def test_multipart(self):
+        self.assert_created(self.post_multipart(make_png()))
+
+    def test_multipart_invalid_json(self):
+        response = self.client.post(self.URL, {
+            'name': 'Омлет', 'text': 'text', 'cooking_time': 10,
+            'tags': 'breakfast', 'ingredients': '[]',
+            'image': SimpleUploadedFile('omelet.png', make_png()),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_too_many_bytes(self):
+        image = make_png()
+        with self.settings(RECIPE_IMAGE_MAX_BYTES=len(image) - 1):
+            response = self.post_multipart(image)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_too_many_pixels(self):
+        with self.settings(RECIPE_IMAGE_MAX_PIXELS=20 * 20 - 1):
+            response = self.post_multipart(make_png())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ['image'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_base64(self):
+        image = base64.b64encode(make_png()).decode()
+        response = self.client.post(self.URL, {
+            'name': 'Омлет',
+            'text': 'text',
+            'cooking_time': 10,
+            'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 3}],
+            'image': f'data:image/png;base64,{image}',
+        }, format='json')
+        self.assert_created(response)
+
+    def test_base64_too_many_bytes(self):
+        image = make_png()
+        with self.settings(RECIPE_IMAGE_MAX_BYTES=len(image) - 1):
+            response = self.client.post(self.URL, {
+                'name': 'Омлет',
+                'text': 'text',
+                'cooking_time': 10,
+                'tags': [self.tag.id],
+                'ingredients': [{'id': self.ingredient.id, 'amount': 3}],
+                'image': 'data:image/png;base64,{}'.format(
+                    base64.b64encode(image).decode()
+                ),
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ['image'])
@@ -1,31 +1,89 @@
+from django.db import transaction
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.response import Response
 
-from api.serializers import FavoriteSerializer
-from recipes.models import Recipe
+from api.serializers import RecipeShortSerializer
+from recipes import counters, lists, totals
+from recipes.models import Recipe, ShoppingCart
+from recipes.versions import bump_version, user_lists
 
 
 def add_to(self, model, user, pk, name):
     """Добавление рецепта в список пользователя."""
-    recipe = get_object_or_404(Recipe, pk=pk)
-    relation = model.objects.filter(user=user, recipe=pk)
-    if relation.exists():
+    recipe_id = recipe_pk(pk)
+    with transaction.atomic():
+        recipe = lists.add(model, user.id, recipe_id)
+        if recipe is not None and model is ShoppingCart:
+            totals.add_recipes(user.id, [recipe_id])
+    if recipe is None:
+        get_object_or_404(Recipe, pk=recipe_id)
         return Response(
             {'errors': f'Нельзя повторно добавить рецепт в {name}.'},
             status=status.HTTP_400_BAD_REQUEST)
-    instance = model.objects.create(user=user, recipe=recipe)
-    serializer = FavoriteSerializer(instance)
+    bump_version(user_lists(user.id))
+    serializer = RecipeShortSerializer(recipe)
     return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
 
 def delete_from(self, model, user, pk, name):
     """"Удаление рецепта из списка пользователя."""
-    recipe = get_object_or_404(Recipe, pk=pk)
-    relation = model.objects.filter(user=user, recipe=recipe)
-    if not relation.exists():
+    recipe_id = recipe_pk(pk)
+    with transaction.atomic():
+        deleted = lists.remove(model, user.id, recipe_id)
+        if deleted and model is ShoppingCart:
+            totals.remove_recipes(user.id, [recipe_id])
+    if not deleted:
+        get_object_or_404(Recipe, pk=recipe_id)
         return Response(
             {'errors': f'Рецепт уже удален из {name}'},
             status=status.HTTP_400_BAD_REQUEST)
-    relation.delete()
+    bump_version(user_lists(user.id))
     return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def recipe_pk(pk):
+    try:
+        return int(pk)
+    except ValueError:
+        raise Http404
+
+
+def bulk_change(model, user, recipe_ids, add):
+    """Массовое добавление (add=True) или удаление рецептов из списка
+    пользователя одной вставкой или одним удалением. Возвращает id
+    изменённых, уже бывших в нужном состоянии и несуществующих рецептов.
+    Счетчики и итоги меняются только для строк, которые вернул RETURNING,
+    поэтому параллельные переключения не учитываются дважды."""
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    with transaction.atomic():
+        found = set(
+            Recipe.objects.filter(id__in=recipe_ids)
+            .values_list('id', flat=True)
+        )
+        change = lists.add_many if add else lists.remove_many
+        changed = set(change(model, user.id, recipe_ids))
+        counters.change(
+            Recipe.objects.filter(pk__in=changed),
+            counters.LIST_COUNTERS[model], 1 if add else -1
+        )
+        if model is ShoppingCart and changed:
+            if add:
+                totals.add_recipes(user.id, changed)
+            else:
+                totals.remove_recipes(user.id, changed)
+    if changed:
+        bump_version(user_lists(user.id))
+    return {
+        'applied': [
+            recipe_id for recipe_id in recipe_ids if recipe_id in changed
+        ],
+        'skipped': [
+            recipe_id for recipe_id in recipe_ids
+            if recipe_id in found and recipe_id not in changed
+        ],
+        'missing': [
+            recipe_id for recipe_id in recipe_ids if recipe_id not in found
+        ],
+    }
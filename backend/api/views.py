@@ -1,37 +1,54 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, response, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
 
-from api.filters import IngredientFilter, RecipeFilter
+from api.filters import RecipeFilter
+from api.ingredient_index import ingredient_index
+from api.mixins import CatalogCacheMixin
 from api.pagination import CustomPagination
+from api.parsers import RecipeMultiPartParser
 from api.serializers import (IngredientSerializer,
+                             RecipeIdsSerializer,
                              RecipeSerializer,
                              RecipeWriteSerializer,
+                             ShoppingCartTotalSerializer,
                              TagSerializer)
 from api.permissions import AuthorOrReadOnly
-from api.utils import add_to, delete_from
-from recipes.models import (Amount, Favorite, Ingredient,
-                            Recipe, ShoppingCart, Tag)
+from api.renderers import (ShoppingListCSVRenderer, ShoppingListJSONRenderer,
+                           ShoppingListTextRenderer)
+from api.utils import add_to, bulk_change, delete_from
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.versions import INGREDIENTS, RECIPES, TAGS
 
+SHOPPING_LIST_CHUNK_SIZE = 500
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     http_method_names = ('get',)
     permission_classes = (permissions.AllowAny,)
+    catalog_version = TAGS
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
     pagination_class = None
     http_method_names = ('get',)
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    catalog_version = INGREDIENTS
+
+    def render_list(self):
+        """Поиск по началу названия (?name=) через индекс в памяти."""
+        fragments = ingredient_index.search(
+            self.request.query_params.get('name', '')
+        )
+        return b'[' + b','.join(fragments) + b']'
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -41,7 +58,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = CustomPagination
+    cursor_ordering = ('-pub_date', '-id')
+    count_versions = (RECIPES,)
+    count_user_params = ('is_favorited', 'is_in_shopping_cart')
     permission_classes = (AuthorOrReadOnly,)
+    parser_classes = (JSONParser, RecipeMultiPartParser)
+
+    def get_queryset(self):
+        """Рецепты с автором и флагами избранного и корзины. Теги и
+        ингредиенты подгружаются только для представлений, которых
+        нет в кэше."""
+        queryset = super().get_queryset().select_related('author')
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+        )
 
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
@@ -80,30 +118,65 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return delete_from(self, ShoppingCart, user, pk, name)
         return response.Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    @action(methods=['post', 'delete'],
+            detail=False,
+            url_path='favorite',
+            url_name='favorite-bulk',
+            permission_classes=[permissions.IsAuthenticated])
+    def favorite_bulk(self, request):
+        """Массовое добавление и удаление рецептов в Избранное."""
+        return self.bulk_change(Favorite, request)
+
+    @action(methods=['post', 'delete'],
+            detail=False,
+            url_path='shopping_cart',
+            url_name='shopping_cart-bulk',
+            permission_classes=[permissions.IsAuthenticated])
+    def shopping_cart_bulk(self, request):
+        """Массовое добавление и удаление рецептов в список покупок."""
+        return self.bulk_change(ShoppingCart, request)
+
+    def bulk_change(self, model, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return response.Response(bulk_change(
+            model, request.user, serializer.validated_data['recipes'],
+            add=request.method == 'POST'
+        ))
+
     @action(detail=False, methods=['get'],
-            permission_classes=(permissions.IsAuthenticated,))
+            permission_classes=(permissions.IsAuthenticated,),
+            renderer_classes=(ShoppingListTextRenderer,
+                              ShoppingListCSVRenderer,
+                              ShoppingListJSONRenderer))
     def download_shopping_cart(self, request, **kwargs):
-        """Формирование и скачивание списка покупок."""
-        user = request.user
+        """Формирование и скачивание списка покупок (?format=txt|csv|json).
+        Итоги читаются из БД курсором и отдаются клиенту потоком."""
         ingredients = (
-            Amount.objects
-            .filter(recipe__in_shopping_cart__user=user)
-            .values('ingredient')
-            .annotate(total_amount=Sum('amount'))
+            request.user.cart_totals
+            .order_by('ingredient__name')
             .values_list('ingredient__name',
                          'ingredient__measurement_unit',
-                         'total_amount'
-                         )
+                         'amount')
+            .iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
         )
-
-        shopping_cart = []
-        [shopping_cart.append(
-            '{} ({}) — {}'.format(*ingredient)) for ingredient in ingredients]
-        response = HttpResponse(
-            'Cписок покупок:\n' + '\n'.join(shopping_cart),
-            content_type='text/plain',
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
             status=status.HTTP_200_OK
         )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.txt"')
+            f'attachment; filename="shopping_cart.{renderer.format}"')
         return response
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(permissions.IsAuthenticated,))
+    def shopping_list(self, request):
+        """Текущие итоги списка покупок."""
+        serializer = ShoppingCartTotalSerializer(
+            request.user.cart_totals.select_related('ingredient')
+            .order_by('ingredient__name'),
+            many=True
+        )
+        return response.Response(serializer.data)
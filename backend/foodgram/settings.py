@@ -1,7 +1,7 @@
 import os
-from dotenv import load_dotenv
 from pathlib import Path
 
+from dotenv import load_dotenv
 
 load_dotenv()
 
@@ -44,6 +44,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+DB_STATS_ENABLED = os.getenv('DB_STATS_ENABLED', 'False') == 'True'
+DB_STATS_SAMPLE_RATE = float(os.getenv('DB_STATS_SAMPLE_RATE', 1))
+DB_STATS_SLOW_REQUEST_MS = float(os.getenv('DB_STATS_SLOW_REQUEST_MS', 500))
+DB_STATS_TOP_QUERIES = 5
+
+if DB_STATS_ENABLED:
+    MIDDLEWARE.insert(0, 'api.middleware.DatabaseStatsMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -75,6 +83,48 @@ DATABASES = {
     }
 }
 
+if os.getenv('DB_ENGINE') == 'sqlite3':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    }
+
+# Реплики для чтения: хосты PostgreSQL или файлы SQLite через запятую.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(DATABASES['default'])
+    if os.getenv('DB_ENGINE') == 'sqlite3':
+        DATABASES[alias]['NAME'] = BASE_DIR / replica
+    else:
+        # Реплика PostgreSQL только для чтения: в тестах она зеркало.
+        DATABASES[alias]['HOST'] = replica
+        DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+# Сколько секунд после записи клиент читает только из основной БД.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+# Модели, которые всегда читаются из основной БД.
+PRIMARY_ONLY_MODELS = ('authtoken.token', 'recipes.imagejob')
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['api.db_router.PrimaryReplicaRouter']
+    MIDDLEWARE.insert(0, 'api.middleware.ReplicaRoutingMiddleware')
+
+# Версии данных хранятся в кэше по умолчанию. Команды и обработчик
+# изображений работают в отдельных процессах, поэтому в docker compose
+# используется общий memcached, а не LocMemCache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,13 +167,46 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
 }
 
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 30))
+
+PAGINATION_COUNT_CACHE_TIMEOUT = 300
+PAGINATION_ESTIMATE_COUNT = (
+    os.getenv('PAGINATION_ESTIMATE_COUNT', 'False') == 'True'
+)
+PAGINATION_ESTIMATE_MIN_ROWS = 100000
+
+CATALOG_CACHE_SIZE = 1024
+CATALOG_CACHE_MAX_AGE = 60
+# Сколько секунд живет готовый ответ справочника в памяти процесса.
+# Ограничивает устаревание, если CACHES не общий для процессов.
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 60))
+
+RECIPE_CACHE_SIZE = 2048
+RECIPE_CACHE_ALIAS = os.getenv('RECIPE_CACHE_ALIAS')
+RECIPE_CACHE_TIMEOUT = 60 * 60
+# Сколько секунд представление рецепта живет в памяти процесса.
+RECIPE_LOCAL_CACHE_TIMEOUT = int(os.getenv('RECIPE_LOCAL_CACHE_TIMEOUT', 60))
+
+RECIPE_IMAGE_MAX_BYTES = int(
+    os.getenv('RECIPE_IMAGE_MAX_BYTES', 5 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.getenv('RECIPE_IMAGE_MAX_PIXELS', 4096 * 4096)
+)
+RECIPE_BULK_MAX_IDS = 100
+RECIPE_IMAGE_VARIANTS = {'thumbnail': 320, 'medium': 960}
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_JOB_TIMEOUT = 10 * 60
+RECIPE_IMAGE_JOB_ATTEMPTS = 3
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'PERMISSIONS': {
@@ -1,6 +1,9 @@
 from django.contrib import admin
 
-from recipes.models import Amount, Ingredient, Recipe, Tag
+from recipes import counters, images, totals
+from recipes.models import (Amount, ImageJob, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from recipes.search import index_recipes
 
 
 @admin.register(Tag)
@@ -35,5 +38,34 @@ class RecipesAdmin(admin.ModelAdmin):
     inlines = [AmountInLine, ]
     readonly_fields = ('count_in_favorites', )
 
+    @admin.display(
+        description='В избранном', ordering='favorites_count'
+    )
     def count_in_favorites(self, obj):
-        return obj.favorited.count()
+        return obj.favorites_count
+
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            obj.image_variants = {}
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            images.enqueue(obj)
+        if change and 'author' in form.changed_data:
+            # Сигналы считают только создание и удаление рецепта.
+            counters.recount_users([form.initial['author'], obj.author_id])
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        index_recipes([form.instance.id])
+        totals.rebuild(
+            ShoppingCart.objects.filter(recipe=form.instance).values_list(
+                'user_id', flat=True
+            )
+        )
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipe', 'source', 'status', 'attempts', 'updated')
+    list_filter = ('status', )
+    readonly_fields = ('recipe', 'source', 'attempts', 'error', 'updated')
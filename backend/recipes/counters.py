@@ -0,0 +1,63 @@
+"""Денормализованные счетчики рецептов и пользователей.
+
+Recipe.favorites_count, Recipe.carts_count, User.recipes_count и
+User.followers_count меняются выражениями F() вместе с записью, которая
+их затрагивает. recount() заново выводит значения из связанных таблиц.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow
+
+User = get_user_model()
+
+LIST_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'carts_count',
+}
+
+
+def change(queryset, field, delta):
+    """Атомарно прибавляет delta к счетчику у записей queryset.
+    Счетчик не опускается ниже нуля, даже если успел разойтись с БД."""
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def counted(model, field):
+    """Подзапрос с числом строк model, ссылающихся на внешний объект."""
+    return Coalesce(Subquery(
+        model.objects
+        .filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def recount_recipes(recipe_ids):
+    return Recipe.objects.filter(id__in=recipe_ids).update(
+        favorites_count=counted(Favorite, 'recipe'),
+        carts_count=counted(ShoppingCart, 'recipe'),
+    )
+
+
+def recount_users(user_ids):
+    return User.objects.filter(id__in=user_ids).update(
+        recipes_count=counted(Recipe, 'author'),
+        followers_count=counted(Follow, 'author'),
+    )
+
+
+def batches(queryset, batch_size):
+    """id записей queryset пачками по batch_size."""
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last_id = 0
+    while True:
+        batch = list(ids.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
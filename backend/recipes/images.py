@@ -0,0 +1,102 @@
+"""Уменьшенные копии изображений рецептов.
+
+Запросы только ставят задание ImageJob в той же транзакции, что и
+сохранение рецепта. Копии строит команда process_images в пуле
+процессов; пока их нет, клиенты получают исходное изображение.
+"""
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image
+
+from recipes.models import ImageJob, Recipe
+from recipes.versions import bump_version, recipe_payload
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def enqueue(recipe):
+    """Ставит задание на копии текущего изображения рецепта."""
+    if recipe.image:
+        ImageJob.objects.create(recipe=recipe, source=recipe.image.name)
+
+
+def variant_name(source, size, extension):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f'images/variants/{stem}_{size}.{extension}'
+
+
+def render_variants(source):
+    """Строит копии всех размеров и форматов: {size: {format: name}}.
+    Выполняется в дочернем процессе и не обращается к БД."""
+    variants = {}
+    with default_storage.open(source) as file, Image.open(file) as image:
+        image = image.convert('RGB')
+        for size, width in settings.RECIPE_IMAGE_VARIANTS.items():
+            copy = image.copy()
+            copy.thumbnail((width, width * 4))
+            variants[size] = {}
+            for extension, format in FORMATS.items():
+                content = ContentFile(b'')
+                copy.save(
+                    content, format, quality=settings.RECIPE_IMAGE_QUALITY
+                )
+                name = variant_name(source, size, extension)
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                variants[size][extension] = default_storage.save(
+                    name, content
+                )
+    return variants
+
+
+def claim(limit):
+    """Забирает до limit заданий: ожидающие и зависшие в работе
+    дольше RECIPE_IMAGE_JOB_TIMEOUT секунд."""
+    stale = timezone.now() - timedelta(
+        seconds=settings.RECIPE_IMAGE_JOB_TIMEOUT
+    )
+    with transaction.atomic():
+        ids = list(
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=ImageJob.PENDING)
+                | Q(status=ImageJob.RUNNING, updated__lt=stale)
+            )
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        ImageJob.objects.filter(id__in=ids).update(
+            status=ImageJob.RUNNING,
+            attempts=F('attempts') + 1,
+            updated=timezone.now()
+        )
+    return list(ImageJob.objects.filter(id__in=ids))
+
+
+def complete(job, variants):
+    """Сохраняет копии, если изображение рецепта с тех пор не менялось."""
+    with transaction.atomic():
+        Recipe.objects.filter(pk=job.recipe_id, image=job.source).update(
+            image_variants=variants
+        )
+        ImageJob.objects.filter(pk=job.pk).update(
+            status=ImageJob.DONE, error=''
+        )
+    bump_version(recipe_payload(job.recipe_id))
+
+
+def fail(job, error):
+    """Возвращает задание в очередь или помечает его неудачным."""
+    status = ImageJob.PENDING
+    if job.attempts >= settings.RECIPE_IMAGE_JOB_ATTEMPTS:
+        status = ImageJob.FAILED
+    ImageJob.objects.filter(pk=job.pk).update(
+        status=status, error=str(error)
+    )
@@ -0,0 +1,129 @@
+"""Добавление рецепта в избранное или корзину без предварительных
+проверок: повторы отсекает уникальное ограничение (ON CONFLICT DO
+NOTHING), несуществующий рецепт — вставка через SELECT из рецептов.
+На PostgreSQL вставка или удаление и счетчик рецепта меняются одним
+запросом.
+Массовые изменения возвращают id рецептов, строки которых
+действительно вставлены или удалены (RETURNING).
+"""
+from django.db import connection
+
+from recipes import counters
+from recipes.counters import LIST_COUNTERS
+from recipes.models import Recipe
+
+RETURNING = 'id, name, image, image_variants, cooking_time'
+
+INSERT = (
+    'INSERT INTO {relation} (user_id, recipe_id) '
+    'SELECT %s, id FROM {recipe} WHERE id = %s '
+    'ON CONFLICT DO NOTHING'
+)
+
+INSERT_MANY = (
+    'INSERT INTO {relation} (user_id, recipe_id) '
+    'SELECT %s, id FROM {recipe} WHERE id IN ({ids}) '
+    'ON CONFLICT DO NOTHING RETURNING recipe_id'
+)
+
+DELETE_MANY = (
+    'DELETE FROM {relation} WHERE user_id = %s AND recipe_id IN ({ids}) '
+    'RETURNING recipe_id'
+)
+
+INCREMENT = (
+    'UPDATE {recipe} SET {counter} = {counter} + 1 '
+    'WHERE id = %s RETURNING {returning}'
+)
+
+DELETE = (
+    'DELETE FROM {relation} WHERE user_id = %s AND recipe_id = %s'
+)
+
+DELETE_AND_DECREMENT = (
+    'WITH removed AS (' + DELETE + ' RETURNING recipe_id) '
+    'UPDATE {recipe} SET {counter} = GREATEST({counter} - 1, 0) '
+    'FROM removed WHERE {recipe}.id = removed.recipe_id'
+)
+
+INSERT_AND_INCREMENT = (
+    'WITH added AS (' + INSERT + ' RETURNING recipe_id) '
+    'UPDATE {recipe} SET {counter} = {counter} + 1 FROM added '
+    'WHERE {recipe}.id = added.recipe_id RETURNING {returning}'
+)
+
+
+def add(model, user_id, recipe_id):
+    """Добавляет рецепт в список model и увеличивает его счетчик.
+    Возвращает рецепт с полями RETURNING или None, если рецепт уже
+    в списке или не существует. Вызывается внутри транзакции."""
+    quote = connection.ops.quote_name
+    names = {
+        'relation': quote(model._meta.db_table),
+        'recipe': quote(Recipe._meta.db_table),
+        'counter': quote(LIST_COUNTERS[model]),
+        'returning': RETURNING,
+    }
+    if connection.vendor == 'postgresql':
+        recipes = Recipe.objects.raw(
+            INSERT_AND_INCREMENT.format(**names), [user_id, recipe_id]
+        )
+        return next(iter(recipes), None)
+    with connection.cursor() as cursor:
+        cursor.execute(INSERT.format(**names), [user_id, recipe_id])
+        if not cursor.rowcount:
+            return None
+    return next(iter(Recipe.objects.raw(
+        INCREMENT.format(**names), [recipe_id]
+    )), None)
+
+
+def remove(model, user_id, recipe_id):
+    """Удаляет рецепт из списка model и уменьшает его счетчик.
+    Возвращает False, если рецепта в списке не было. Вызывается
+    внутри транзакции."""
+    quote = connection.ops.quote_name
+    names = {
+        'relation': quote(model._meta.db_table),
+        'recipe': quote(Recipe._meta.db_table),
+        'counter': quote(LIST_COUNTERS[model]),
+    }
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                DELETE_AND_DECREMENT.format(**names), [user_id, recipe_id]
+            )
+            return bool(cursor.rowcount)
+    with connection.cursor() as cursor:
+        cursor.execute(DELETE.format(**names), [user_id, recipe_id])
+        if not cursor.rowcount:
+            return False
+    counters.change(
+        Recipe.objects.filter(pk=recipe_id), LIST_COUNTERS[model], -1
+    )
+    return True
+
+
+def change_many(statement, model, user_id, recipe_ids):
+    if not recipe_ids:
+        return []
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(statement.format(
+            relation=quote(model._meta.db_table),
+            recipe=quote(Recipe._meta.db_table),
+            ids=', '.join(['%s'] * len(recipe_ids)),
+        ), [user_id, *recipe_ids])
+        return [recipe_id for recipe_id, in cursor.fetchall()]
+
+
+def add_many(model, user_id, recipe_ids):
+    """Добавляет рецепты в список model. Возвращает id рецептов,
+    которые действительно добавлены этим запросом."""
+    return change_many(INSERT_MANY, model, user_id, recipe_ids)
+
+
+def remove_many(model, user_id, recipe_ids):
+    """Удаляет рецепты из списка model. Возвращает id рецептов,
+    которые действительно удалены этим запросом."""
+    return change_many(DELETE_MANY, model, user_id, recipe_ids)
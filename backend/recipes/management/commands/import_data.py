@@ -1,55 +1,236 @@
 import csv
+import io
+import json
 import os
-import sys
+from collections import namedtuple
+from itertools import islice
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
-from django.core.management import BaseCommand
 from recipes.models import Ingredient, Tag
+from recipes.versions import INGREDIENTS, TAGS, bump_version
+
+Catalog = namedtuple(
+    'Catalog', ('model', 'fields', 'unique', 'update', 'version')
+)
+
+CATALOGS = {
+    'ingredients': Catalog(
+        Ingredient, ('name', 'measurement_unit'),
+        ('name', 'measurement_unit'), (), INGREDIENTS
+    ),
+    'tags': Catalog(
+        Tag, ('name', 'color', 'slug'), ('slug', ), ('name', 'color'), TAGS
+    ),
+}
+
+JSON_CHUNK_SIZE = 64 * 1024
+
 
-from foodgram import settings
+def read_csv(file, fields):
+    """Строки CSV как словари. Первая строка считается заголовком,
+    только если совпадает с названиями полей."""
+    reader = csv.reader(file)
+    first = next(reader, None)
+    if first is None:
+        return
+    header = [column.strip() for column in first]
+    if set(header) == set(fields):
+        columns = header
+    else:
+        columns = fields
+        yield dict(zip(columns, first))
+    for row in reader:
+        yield dict(zip(columns, row))
+
+
+def read_json(file, fields):
+    """Объекты JSON-массива или JSON Lines, по одному, без загрузки
+    всего файла в память."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if eof:
+                if buffer[position:].strip():
+                    raise CommandError(
+                        f'Ошибка JSON около символа {position}.'
+                    )
+                return
+            chunk = file.read(JSON_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+READERS = {'.csv': read_csv, '.json': read_json, '.jsonl': read_json}
 
 
 class Command(BaseCommand):
-    help = 'Загрузка данных в БД'
-    TABLES = (
-        ('ingredients.csv', Ingredient,
-            ('name', 'measurement_unit')),
-        ('tags.csv', Tag,
-            ('name', 'color', 'slug'))
-    )
-
-    def handle(self, *args, **options):
-        print('--Начинаем импорт данных--')
-        # path = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
-        # print(path)
-
-        for csv_name, model, fields in self.TABLES:
-            try:
-                csv_file = open(
-                    os.path.join(settings.BASE_DIR, 'data', csv_name),
-                    'r',
-                    encoding='utf-8'
+    help = ('Загрузка справочников ингредиентов и тегов из CSV или JSON. '
+            'Повторный запуск не создает дублей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files', nargs='*',
+            help='Файлы для загрузки, по умолчанию data/ingredients.csv '
+                 'и data/tags.csv. Справочник определяется по имени файла.'
+        )
+        parser.add_argument('--catalog', choices=CATALOGS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--progress', type=int, default=100000,
+            help='Сообщать о ходе загрузки каждые N строк.'
+        )
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY на PostgreSQL.'
+        )
+
+    def handle(self, *args, files, catalog, batch_size, progress, no_copy,
+               **options):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.use_copy = connection.vendor == 'postgresql' and not no_copy
+        if not files:
+            files = [
+                os.path.join(settings.BASE_DIR, 'data', name)
+                for name in ('ingredients.csv', 'tags.csv')
+            ]
+        for path in files:
+            stem, extension = os.path.splitext(os.path.basename(path))
+            name = catalog or stem
+            if name not in CATALOGS:
+                raise CommandError(
+                    f'Неизвестный справочник для файла {path}.'
                 )
-            except FileNotFoundError:
-                print(f'Файл {csv_name} не найден.')
-                sys.exit()
-            except OSError:
-                print('Произошла ошибка операционной системы '
-                      f'при попытке открыть файл {csv_name}.')
-                sys.exit()
-            except Exception as err:
-                print(f'Неожиданная ошибка при открытии файла {csv_name}: ',
-                      repr(err))
-                sys.exit()
+            if extension not in READERS:
+                raise CommandError(f'Неподдерживаемый формат файла {path}.')
+            try:
+                file = open(path, encoding='utf-8-sig', newline='')
+            except OSError as err:
+                raise CommandError(f'Не удалось открыть {path}: {err}')
+            with file:
+                self.load(path, CATALOGS[name], READERS[extension](
+                    file, CATALOGS[name].fields
+                ))
+            bump_version(CATALOGS[name].version)
+
+    def load(self, path, catalog, items):
+        """Загружает строки пачками по batch_size, каждую в своей
+        транзакции."""
+        rows = self.clean(catalog, items)
+        read = written = 0
+        reported = 0
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                if self.use_copy:
+                    written += self.copy(catalog, batch)
+                else:
+                    written += self.upsert(catalog, batch)
+            read += len(batch)
+            if read - reported >= self.progress:
+                reported = read
+                self.stdout.write(f'{path}: {read} строк')
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт из файла {path} выполнен: {read} строк, '
+            f'записано {written}, пропущено {self.skipped}.'
+        ))
+
+    def clean(self, catalog, items):
+        """Строки в виде кортежей полей. Строки с пустыми или слишком
+        длинными значениями пропускаются."""
+        self.skipped = 0
+        limits = [
+            catalog.model._meta.get_field(field).max_length
+            for field in catalog.fields
+        ]
+        for item in items:
+            row = tuple(
+                str(item.get(field) or '').strip() for field in catalog.fields
+            )
+            if all(0 < len(value) <= limit
+                   for value, limit in zip(row, limits)):
+                yield row
             else:
-                with csv_file:
-                    reader = csv.reader(csv_file)
-                    next(reader)
-                    data_map = {}
-                    obj = []
-                    for row in reader:
-                        for i in range(len(fields)):
-                            data_map[fields[i]] = row[i]
-                        obj.append(model(**data_map))
-                    model.objects.bulk_create(obj)
-                    print(f'Импорт из файла {csv_name} выполнен.')
-        print('--Все импорты прошли успешно--')
+                self.skipped += 1
+
+    def conflict_clause(self, catalog):
+        quote = connection.ops.quote_name
+        if not catalog.update:
+            return 'ON CONFLICT DO NOTHING'
+        return 'ON CONFLICT ({}) DO UPDATE SET {}'.format(
+            ', '.join(map(quote, catalog.unique)),
+            ', '.join(
+                f'{quote(field)} = EXCLUDED.{quote(field)}'
+                for field in catalog.update
+            )
+        )
+
+    def unique_rows(self, catalog, batch):
+        """Последняя строка для каждого ключа: ON CONFLICT DO UPDATE
+        не может изменить одну запись дважды за запрос."""
+        key = [catalog.fields.index(field) for field in catalog.unique]
+        return list({
+            tuple(row[i] for i in key): row for row in batch
+        }.values())
+
+    def upsert(self, catalog, batch):
+        quote = connection.ops.quote_name
+        table = quote(catalog.model._meta.db_table)
+        columns = ', '.join(map(quote, catalog.fields))
+        placeholders = '({})'.format(', '.join(['%s'] * len(catalog.fields)))
+        rows = self.unique_rows(catalog, batch)
+        size = connection.ops.bulk_batch_size(catalog.fields, rows)
+        written = 0
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), size):
+                chunk = rows[start:start + size]
+                cursor.execute(
+                    f'INSERT INTO {table} ({columns}) VALUES '
+                    + ', '.join([placeholders] * len(chunk))
+                    + ' ' + self.conflict_clause(catalog),
+                    [value for row in chunk for value in row]
+                )
+                written += cursor.rowcount
+        return written
+
+    def copy(self, catalog, batch):
+        """PostgreSQL: COPY во временную таблицу и одна вставка из нее."""
+        quote = connection.ops.quote_name
+        table = quote(catalog.model._meta.db_table)
+        staging = quote(f'import_{catalog.model._meta.db_table}')
+        columns = ', '.join(map(quote, catalog.fields))
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS {staging} '
+                f'ON COMMIT DELETE ROWS '
+                f'AS SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f'COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT ON ({", ".join(map(quote, catalog.unique))})'
+                f' {columns} FROM {staging} '
+                + self.conflict_clause(catalog)
+            )
+            return cursor.rowcount
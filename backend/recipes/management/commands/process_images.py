@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management import BaseCommand
+from django.db import connections
+
+from recipes import images
+
+
+class Command(BaseCommand):
+    help = 'Уменьшенные копии изображений рецептов из очереди заданий'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument(
+            '--sleep', type=float, default=5,
+            help='Пауза в секундах, когда очередь пуста.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь и завершиться.'
+        )
+
+    def handle(self, *args, workers, batch_size, sleep, once, **options):
+        # Дочерние процессы не должны наследовать соединения с БД.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                jobs = images.claim(batch_size)
+                if jobs:
+                    self.process(pool, jobs)
+                elif once:
+                    break
+                else:
+                    time.sleep(sleep)
+
+    def process(self, pool, jobs):
+        futures = [
+            (job, pool.submit(images.render_variants, job.source))
+            for job in jobs
+        ]
+        for job, future in futures:
+            try:
+                images.complete(job, future.result())
+            except Exception as error:
+                images.fail(job, error)
+                self.stderr.write(f'{job.source}: {error}')
+            else:
+                self.stdout.write(f'{job.source}: готово')
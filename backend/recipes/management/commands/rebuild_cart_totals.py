@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes import totals
+
+
+class Command(BaseCommand):
+    help = 'Пересчет итогов списков покупок по корзинам пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='id пользователя (можно указать несколько раз)'
+        )
+
+    def handle(self, *args, user_ids=None, **options):
+        with transaction.atomic():
+            totals.rebuild(user_ids)
+        self.stdout.write('Итоги списков покупок пересчитаны.')
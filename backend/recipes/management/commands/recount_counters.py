@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes import counters
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков избранного, корзин, рецептов и подписчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        for name, queryset, recount in (
+            ('рецептов', Recipe.objects.all(), counters.recount_recipes),
+            ('пользователей', User.objects.all(), counters.recount_users),
+        ):
+            total = 0
+            for batch in counters.batches(queryset, batch_size):
+                with transaction.atomic():
+                    total += recount(batch)
+            self.stdout.write(f'Пересчитаны счетчики {name}: {total}.')
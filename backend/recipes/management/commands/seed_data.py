@@ -0,0 +1,171 @@
+import random
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+
+from recipes import counters, totals
+from recipes.models import (Amount, Favorite, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from recipes.search import index_recipes
+from recipes.versions import RECIPES, bump_version, user_lists
+from users.models import Follow
+
+User = get_user_model()
+
+SEED_PREFIX = 'seed_user_'
+PASSWORD = 'seed-password'
+
+
+def chunks(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = ('Детерминированные тестовые данные для нагрузочных замеров: '
+            'пользователи, рецепты, избранное, корзины и подписки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Рецептов в избранном у пользователя.')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Рецептов в корзине у пользователя.')
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок у пользователя.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true',
+                            help='Удалить ранее созданные тестовые данные.')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        seeded = User.objects.filter(username__startswith=SEED_PREFIX)
+        if options['clear']:
+            seeded.delete()
+        elif seeded.exists():
+            raise CommandError(
+                'Тестовые данные уже есть, используйте --clear.'
+            )
+        if not Ingredient.objects.exists() or not Tag.objects.exists():
+            call_command('import_data', stdout=self.stdout)
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        self.tag_ids = list(
+            Tag.objects.order_by('pk').values_list('pk', flat=True)
+        )
+        user_ids = self.create_users(options['users'])
+        recipe_ids = self.create_recipes(
+            user_ids, options['recipes'], options['ingredients_per_recipe']
+        )
+        self.create_relations(Favorite, user_ids, recipe_ids,
+                              options['favorites'])
+        self.create_relations(ShoppingCart, user_ids, recipe_ids,
+                              options['carts'])
+        self.create_follows(user_ids, options['follows'])
+        self.refresh(user_ids, recipe_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}.'
+        ))
+
+    def bulk_create(self, model, objects):
+        for chunk in chunks(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, ignore_conflicts=True)
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        self.bulk_create(User, (
+            User(
+                username=f'{SEED_PREFIX}{i}',
+                email=f'{SEED_PREFIX}{i}@example.com',
+                first_name=f'Имя{i}',
+                last_name=f'Фамилия{i}',
+                password=password,
+            ) for i in range(count)
+        ))
+        return list(
+            User.objects.filter(username__startswith=SEED_PREFIX)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def create_recipes(self, user_ids, count, ingredients_per_recipe):
+        self.bulk_create(Recipe, (
+            Recipe(
+                name=f'Рецепт {i}',
+                author_id=self.random.choice(user_ids),
+                text=f'Описание рецепта {i}. ' * self.random.randint(1, 20),
+                cooking_time=self.random.randint(1, 240),
+            ) for i in range(count)
+        ))
+        recipe_ids = list(
+            Recipe.objects.filter(author_id__in=user_ids)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        per_recipe = min(ingredients_per_recipe, len(self.ingredient_ids))
+        self.bulk_create(Amount, (
+            Amount(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.random.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.random.sample(
+                self.ingredient_ids, per_recipe
+            )
+        ))
+        self.bulk_create(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.random.sample(
+                self.tag_ids, self.random.randint(1, len(self.tag_ids))
+            )
+        ))
+        return recipe_ids
+
+    def create_relations(self, model, user_ids, recipe_ids, per_user):
+        per_user = min(per_user, len(recipe_ids))
+        self.bulk_create(model, (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in self.random.sample(recipe_ids, per_user)
+        ))
+
+    def create_follows(self, user_ids, per_user):
+        per_user = min(per_user, len(user_ids) - 1)
+        self.bulk_create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in [
+                author_id
+                for author_id in self.random.sample(user_ids, per_user + 1)
+                if author_id != user_id
+            ][:per_user]
+        ))
+
+    def refresh(self, user_ids, recipe_ids):
+        """Счетчики, итоги корзин и поиск, которые bulk_create
+        не обновляет."""
+        for batch in chunks(recipe_ids, self.batch_size):
+            with transaction.atomic():
+                counters.recount_recipes(batch)
+                index_recipes(batch)
+        for batch in chunks(user_ids, self.batch_size):
+            with transaction.atomic():
+                counters.recount_users(batch)
+                totals.rebuild(batch)
+            for user_id in batch:
+                bump_version(user_lists(user_id))
+        bump_version(RECIPES)
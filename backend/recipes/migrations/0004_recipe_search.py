@@ -0,0 +1,70 @@
+from django.db import migrations
+
+INGREDIENT_NAMES = (
+    'SELECT {aggregate} FROM recipes_amount '
+    'JOIN recipes_ingredient '
+    'ON recipes_ingredient.id = recipes_amount.ingredient_id '
+    'WHERE recipes_amount.recipe_id = recipes_recipe.id'
+)
+
+POSTGRESQL_FORWARD = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector',
+    'CREATE INDEX recipes_recipe_search_vector_idx '
+    'ON recipes_recipe USING gin (search_vector)',
+    'CREATE INDEX recipes_recipe_name_trgm_idx '
+    'ON recipes_recipe USING gin (name gin_trgm_ops)',
+    "UPDATE recipes_recipe SET search_vector = "
+    "setweight(to_tsvector('russian', recipes_recipe.name), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(("
+    + INGREDIENT_NAMES.format(
+        aggregate="string_agg(recipes_ingredient.name, ' ')"
+    )
+    + "), '')), 'B') || "
+    "setweight(to_tsvector('russian', recipes_recipe.text), 'C')",
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS recipes_recipe_name_trgm_idx',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+    "name, ingredients, text, tokenize = 'unicode61 remove_diacritics 2')",
+    'INSERT INTO recipes_recipe_fts (rowid, name, ingredients, text) '
+    'SELECT recipes_recipe.id, recipes_recipe.name, ('
+    + INGREDIENT_NAMES.format(
+        aggregate="group_concat(recipes_ingredient.name, ' ')"
+    )
+    + '), recipes_recipe.text FROM recipes_recipe',
+)
+SQLITE_BACKWARD = (
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for statement in statements.get(vendor, ()):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_auto_20230625_0052'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_statements({
+                'postgresql': POSTGRESQL_FORWARD,
+                'sqlite': SQLITE_FORWARD,
+            }),
+            run_statements({
+                'postgresql': POSTGRESQL_BACKWARD,
+                'sqlite': SQLITE_BACKWARD,
+            }),
+        ),
+    ]
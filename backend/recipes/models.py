@@ -81,6 +81,7 @@ class Recipe(models.Model):
         related_name='recipes',
         to=User,
         on_delete=models.CASCADE,
+        db_index=False,
     )
     text = models.TextField(
         verbose_name='Описание, Как готовить'
@@ -113,6 +114,23 @@ class Recipe(models.Model):
     amount_ingredients = models.ManyToManyField(
         Ingredient, through='Amount'
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        db_index=True,
+        editable=False
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False
+    )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
@@ -124,6 +142,17 @@ class Recipe(models.Model):
                 name='unique_recipe_author',
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            # Рецепты автора в порядке публикации, заменяет индекс author.
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -175,13 +204,15 @@ class ShoppingCart(models.Model):
         to=User,
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
-        related_name='cart'
+        related_name='cart',
+        db_index=False
     )
     recipe = models.ForeignKey(
         to=Recipe,
         on_delete=models.CASCADE,
         verbose_name='В корзине',
-        related_name='in_shopping_cart'
+        related_name='in_shopping_cart',
+        db_index=False
     )
 
     class Meta:
@@ -193,6 +224,14 @@ class ShoppingCart(models.Model):
                 name='recipe_has_been_already_added_in_shoppingcart',
             ),
         ]
+        # Индекс user, recipe дает ограничение уникальности, индекс
+        # recipe, user — соединения и подсчеты по рецепту.
+        indexes = [
+            models.Index(
+                fields=('recipe', 'user'),
+                name='shoppingcart_recipe_user_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} добавил в корзину {self.recipe}'
@@ -204,13 +243,15 @@ class Favorite(models.Model):
         to=User,
         on_delete=models.CASCADE,
         verbose_name='Пользователь',
-        related_name='favorites'
+        related_name='favorites',
+        db_index=False
     )
     recipe = models.ForeignKey(
         to=Recipe,
         on_delete=models.CASCADE,
         verbose_name='В избранном',
-        related_name='favorited'
+        related_name='favorited',
+        db_index=False
     )
 
     class Meta:
@@ -222,6 +263,104 @@ class Favorite(models.Model):
                 name='recipe_has_been_already_added_in_favorites',
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=('recipe', 'user'),
+                name='favorite_recipe_user_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user} добавил в избранное {self.recipe}'
+
+
+class ShoppingCartTotal(models.Model):
+    """Суммарное количество ингредиента(ingredient) в списке покупок
+    пользователя(user). Обновляется вместе с корзиной и составом рецептов."""
+    user = models.ForeignKey(
+        to=User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='cart_totals',
+        db_index=False
+    )
+    ingredient = models.ForeignKey(
+        to=Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='cart_totals'
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_cart_total_ingredient',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} {self.amount}'
+
+
+class ImageJob(models.Model):
+    """Задание на уменьшенные копии изображения рецепта(recipe).
+    Выполняется командой process_images вне обработки запросов."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    recipe = models.ForeignKey(
+        to=Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='image_jobs'
+    )
+    source = models.CharField(
+        verbose_name='Исходное изображение',
+        max_length=255
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попытки',
+        default=0
+    )
+    error = models.TextField(
+        verbose_name='Ошибка',
+        blank=True
+    )
+    updated = models.DateTimeField(
+        verbose_name='Изменено',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = 'Обработка изображения'
+        verbose_name_plural = 'Обработка изображений'
+        indexes = [
+            models.Index(
+                fields=('status', 'id'),
+                name='image_job_status_id_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.source} ({self.status})'
@@ -0,0 +1,125 @@
+"""Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+
+В PostgreSQL документ рецепта хранится в колонке search_vector (tsvector)
+с GIN-индексом, название дополнительно индексируется триграммами.
+В SQLite используется отдельная таблица FTS5. Документ пересчитывается
+через index_recipes после каждого изменения рецепта или его ингредиентов.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Exists, FloatField, OuterRef, Q
+from django.db.models.expressions import RawSQL
+
+from recipes.models import Amount
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+INGREDIENT_NAMES = (
+    'SELECT {aggregate} FROM recipes_amount '
+    'JOIN recipes_ingredient '
+    'ON recipes_ingredient.id = recipes_amount.ingredient_id '
+    'WHERE recipes_amount.recipe_id = recipes_recipe.id'
+)
+PG_DOCUMENT = (
+    "setweight(to_tsvector('{config}', recipes_recipe.name), 'A') || "
+    "setweight(to_tsvector('{config}', coalesce(({ingredients}), '')), 'B')"
+    " || setweight(to_tsvector('{config}', recipes_recipe.text), 'C')"
+).format(
+    config=SEARCH_CONFIG,
+    ingredients=INGREDIENT_NAMES.format(
+        aggregate="string_agg(recipes_ingredient.name, ' ')"
+    ),
+)
+PG_QUERY = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+FTS_WEIGHTS = '10.0, 5.0, 1.0'
+WORD = re.compile(r'\w+')
+
+
+def index_recipes(recipe_ids):
+    """Пересчитывает поисковые документы рецептов."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE recipes_recipe SET search_vector = {PG_DOCUMENT} '
+                f'WHERE recipes_recipe.id IN ({placeholders})',
+                recipe_ids
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                recipe_ids
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+                'SELECT recipes_recipe.id, recipes_recipe.name, ('
+                + INGREDIENT_NAMES.format(
+                    aggregate="group_concat(recipes_ingredient.name, ' ')"
+                )
+                + '), recipes_recipe.text FROM recipes_recipe '
+                f'WHERE recipes_recipe.id IN ({placeholders})',
+                recipe_ids
+            )
+
+
+def unindex_recipes(recipe_ids):
+    """Удаляет документы рецептов из таблицы FTS5 (только SQLite)."""
+    recipe_ids = list(recipe_ids)
+    if connection.vendor != 'sqlite' or not recipe_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids
+        )
+
+
+def search_recipes(queryset, query):
+    """Рецепты, подходящие под запрос, по убыванию релевантности."""
+    if connection.vendor == 'postgresql':
+        return queryset.filter(RawSQL(
+            f'recipes_recipe.search_vector @@ {PG_QUERY} '
+            'OR recipes_recipe.name %% %s',
+            (query, query),
+            output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f'coalesce(ts_rank(recipes_recipe.search_vector, {PG_QUERY}), 0) '
+            '+ similarity(recipes_recipe.name, %s)',
+            (query, query),
+            output_field=FloatField()
+        )).order_by('-search_rank', '-pub_date')
+    words = WORD.findall(query)
+    if not words:
+        return queryset.none()
+    if connection.vendor == 'sqlite':
+        match = ' '.join('"{}"*'.format(word) for word in words)
+        # LIMIT -1 не дает SQLite развернуть подзапрос: совпадения
+        # ранжируются один раз и ищутся по временному индексу, а не
+        # через MATCH заново для каждой строки.
+        return queryset.filter(RawSQL(
+            f'recipes_recipe.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)',
+            (match,),
+            output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            '(SELECT ranked.rank FROM ('
+            f'SELECT rowid AS id, -bm25({FTS_TABLE}, {FTS_WEIGHTS}) AS rank '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT -1'
+            ') AS ranked WHERE ranked.id = recipes_recipe.id)',
+            (match,),
+            output_field=FloatField()
+        )).order_by('-search_rank', '-pub_date')
+    for word in words:
+        queryset = queryset.filter(
+            Q(name__icontains=word)
+            | Q(text__icontains=word)
+            | Exists(Amount.objects.filter(
+                recipe=OuterRef('pk'), ingredient__name__icontains=word
+            ))
+        )
+    return queryset
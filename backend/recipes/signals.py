@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes import counters, totals
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import index_recipes, unindex_recipes
+from recipes.versions import (INGREDIENTS, RECIPES, TAGS, bump_version,
+                              recipe_payload)
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(**kwargs):
+    transaction.on_commit(lambda: bump_version(INGREDIENTS))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(**kwargs):
+    transaction.on_commit(lambda: bump_version(TAGS))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(instance, **kwargs):
+    # После фиксации: иначе запрос между сменой версии и фиксацией
+    # закэширует старые данные под новой версией.
+    # После удаления instance.id уже None, id нужен заранее.
+    recipe_id = instance.id
+    transaction.on_commit(lambda: bump_version(RECIPES))
+    transaction.on_commit(lambda: bump_version(recipe_payload(recipe_id)))
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(instance, created, **kwargs):
+    if not created:
+        index_recipes(
+            Recipe.objects.filter(
+                ingredients__ingredient=instance
+            ).values_list('id', flat=True)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(instance, **kwargs):
+    unindex_recipes([instance.id])
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_totals(instance, **kwargs):
+    totals.change_recipe(instance, totals.recipe_amounts([instance.id]), {})
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(instance, created, **kwargs):
+    if created:
+        counters.change(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(instance, **kwargs):
+    counters.change(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+
+
+@receiver(pre_delete, sender=User)
+def uncount_user_lists(instance, **kwargs):
+    """Избранное и корзина пользователя удаляются каскадом."""
+    for model, field in counters.LIST_COUNTERS.items():
+        counters.change(
+            Recipe.objects.filter(
+                id__in=model.objects.filter(user=instance).values('recipe')
+            ),
+            field, -1
+        )
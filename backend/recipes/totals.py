@@ -0,0 +1,106 @@
+"""Итоги списков покупок в таблице ShoppingCartTotal.
+
+Функции вызываются в той же транзакции, что и изменение корзины или
+состава рецепта, и меняют итоги на разницу в количестве ингредиентов.
+"""
+from collections import defaultdict
+
+from django.db.models import Case, IntegerField, Sum, Value, When
+from django.db.models.expressions import F
+
+from recipes.models import Amount, ShoppingCart, ShoppingCartTotal
+
+
+def recipe_amounts(recipe_ids):
+    """Количество каждого ингредиента в рецептах: {ingredient_id: amount}."""
+    return dict(
+        Amount.objects
+        .filter(recipe_id__in=recipe_ids)
+        .values('ingredient_id')
+        .annotate(total=Sum('amount'))
+        .values_list('ingredient_id', 'total')
+    )
+
+
+def apply_deltas(user_ids, deltas):
+    """Прибавляет к итогам пользователей {ingredient_id: delta}."""
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    ShoppingCartTotal.objects.bulk_create(
+        [
+            ShoppingCartTotal(user_id=user_id, ingredient_id=ingredient_id)
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items() if delta > 0
+        ],
+        ignore_conflicts=True
+    )
+    totals = ShoppingCartTotal.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    )
+    totals.update(amount=F('amount') + Case(
+        *(
+            When(ingredient_id=ingredient_id, then=Value(delta))
+            for ingredient_id, delta in deltas.items()
+        ),
+        default=Value(0),
+        output_field=IntegerField()
+    ))
+    totals.filter(amount__lte=0).delete()
+
+
+def add_recipes(user_id, recipe_ids):
+    """Рецепты добавлены в корзину пользователя."""
+    apply_deltas([user_id], recipe_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Рецепты удалены из корзины пользователя."""
+    apply_deltas([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in recipe_amounts(recipe_ids).items()
+    })
+
+
+def change_recipe(recipe, old_amounts, new_amounts):
+    """Состав рецепта изменился: итоги всех, у кого он в корзине."""
+    deltas = defaultdict(int, new_amounts)
+    for ingredient_id, amount in old_amounts.items():
+        deltas[ingredient_id] -= amount
+    apply_deltas(
+        ShoppingCart.objects.filter(recipe=recipe).values_list(
+            'user_id', flat=True
+        ),
+        deltas
+    )
+
+
+def rebuild(user_ids=None):
+    """Пересчитывает итоги заново по корзинам пользователей
+    (всех, если user_ids не задан)."""
+    totals = ShoppingCartTotal.objects.all()
+    amounts = Amount.objects.filter(recipe__in_shopping_cart__isnull=False)
+    if user_ids is not None:
+        totals = totals.filter(user_id__in=user_ids)
+        amounts = Amount.objects.filter(
+            recipe__in_shopping_cart__user_id__in=user_ids
+        )
+    totals.delete()
+    ShoppingCartTotal.objects.bulk_create(
+        (
+            ShoppingCartTotal(
+                user_id=row['recipe__in_shopping_cart__user'],
+                ingredient_id=row['ingredient'],
+                amount=row['total']
+            )
+            for row in amounts
+            .values('recipe__in_shopping_cart__user', 'ingredient')
+            .annotate(total=Sum('amount'))
+            .order_by()
+        ),
+        batch_size=1000
+    )
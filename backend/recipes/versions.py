@@ -0,0 +1,62 @@
+"""Счетчики версий данных в общем кэше.
+
+Версия меняется при каждой записи в соответствующие таблицы. Кэши,
+ключи которых содержат версию, становятся неактуальными сразу во всех
+процессах, если CACHES указывает на общий для них бэкенд.
+"""
+import time
+
+from django.core.cache import cache
+
+INGREDIENTS = 'ingredients'
+RECIPES = 'recipes'
+TAGS = 'tags'
+
+
+def user_lists(user_id):
+    """Версия избранного и списка покупок пользователя."""
+    return f'lists:{user_id}'
+
+
+def recipe_payload(recipe_id):
+    """Версия представления рецепта."""
+    return f'recipe:{recipe_id}'
+
+
+def author_profile(user_id):
+    """Версия профиля автора в представлениях его рецептов."""
+    return f'author:{user_id}'
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def initial_version():
+    """Начальная версия не повторяет выданные ранее, даже если ключ
+    был вытеснен из кэша."""
+    return time.time_ns()
+
+
+def get_version(name):
+    return cache.get_or_set(version_key(name), initial_version, None)
+
+
+def get_versions(names):
+    """Версии нескольких счетчиков за одно обращение к кэшу."""
+    keys = {version_key(name): name for name in names}
+    found = cache.get_many(keys)
+    missing = {key: initial_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {name: found[key] for key, name in keys.items()}
+
+
+def bump_version(name):
+    try:
+        return cache.incr(version_key(name))
+    except ValueError:
+        version = initial_version()
+        cache.set(version_key(name), version, None)
+        return version
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
 
+from recipes import counters, totals
 from recipes.models import Favorite, Amount, ShoppingCart
 from users.models import Follow, User
 
@@ -26,8 +27,26 @@ class SubscribeAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class RecipeListAdmin(admin.ModelAdmin):
+    """Изменения через админку пересчитывают счетчики рецептов."""
+
+    def save_model(self, request, obj, form, change):
+        recipe_ids = {obj.recipe_id, form.initial.get('recipe')} - {None}
+        super().save_model(request, obj, form, change)
+        counters.recount_recipes(recipe_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        counters.recount_recipes([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        counters.recount_recipes(recipe_ids)
+
+
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(RecipeListAdmin):
     list_display = ('id', 'user', 'recipe')
     list_filter = ('user',)
     search_fields = ('user',)
@@ -35,9 +54,23 @@ class FavoriteAdmin(admin.ModelAdmin):
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(RecipeListAdmin):
     list_display = ('id', 'user', 'recipe')
     list_editable = ('user', 'recipe')
 
+    def save_model(self, request, obj, form, change):
+        user_ids = {obj.user_id, form.initial.get('user')} - {None}
+        super().save_model(request, obj, form, change)
+        totals.rebuild(user_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        totals.rebuild([obj.user_id])
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        totals.rebuild(user_ids)
+
 
 admin.site.unregister(Group)
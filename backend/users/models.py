@@ -28,6 +28,16 @@ class User(AbstractUser):
         blank=False,
         validators=[validate_first_last_name],
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['username']
@@ -47,13 +57,15 @@ class Follow(models.Model):
         to=User,
         verbose_name='Пользователь',
         on_delete=models.CASCADE,
-        related_name='follower'
+        related_name='follower',
+        db_index=False
     )
     author = models.ForeignKey(
         to=User,
         verbose_name='Автор',
         on_delete=models.CASCADE,
-        related_name='following'
+        related_name='following',
+        db_index=False
     )
 
     class Meta:
@@ -65,6 +77,14 @@ class Follow(models.Model):
                 name='unique_follow'
             ),
         ]
+        # Подписчики автора: индекс author, user вместе с уникальным
+        # user, author заменяет одиночные индексы внешних ключей.
+        indexes = [
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.author
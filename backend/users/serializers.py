@@ -21,5 +21,8 @@ class UsersSerializer(UserSerializer):
         request = self.context.get('request')
         if not request.user or request.user.is_anonymous:
             return False
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         subscribe = request.user.follower.filter(author=obj)
         return subscribe.exists()
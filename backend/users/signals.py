@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes import counters
+from recipes.versions import author_profile, bump_version
+from users.models import Follow, User
+
+PROFILE_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(instance, created, **kwargs):
+    if created:
+        counters.change(
+            User.objects.filter(pk=instance.author_id), 'followers_count', 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def count_unfollow(instance, **kwargs):
+    counters.change(
+        User.objects.filter(pk=instance.author_id), 'followers_count', -1
+    )
+
+
+@receiver(post_save, sender=User)
+def profile_changed(instance, update_fields, **kwargs):
+    if update_fields is None or PROFILE_FIELDS & set(update_fields):
+        transaction.on_commit(
+            lambda: bump_version(author_profile(instance.id))
+        )
@@ -1,4 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db.models import (BooleanField, F, Prefetch, Value, Window,
+                              prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import permissions, status
@@ -7,14 +11,34 @@ from rest_framework.response import Response
 
 from api.pagination import CustomPagination
 from api.serializers import FollowListSerializer, FollowSerializer
+from recipes.models import Recipe
 from users.models import Follow
 from users.serializers import UsersSerializer
 
 User = get_user_model()
 
 
+def recipes_limit_per_author(authors, limit):
+    """Не более limit последних рецептов каждого автора одним запросом.
+    Номер рецепта у автора считается оконной функцией ROW_NUMBER."""
+    ranked = Recipe.objects.filter(author__in=authors).order_by().annotate(
+        recipe_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('author_id')],
+            order_by=[F('pub_date').desc(), F('id').desc()],
+        )
+    ).values('id', 'recipe_rank')
+    sql, params = ranked.query.sql_with_params()
+    return Recipe.objects.filter(id__in=RawSQL(
+        f'SELECT ranked.id FROM ({sql}) AS ranked '
+        'WHERE ranked.recipe_rank <= %s',
+        (*params, limit)
+    ))
+
+
 class UsersViewSet(UserViewSet):
     pagination_class = CustomPagination
+    cursor_ordering = ('username',)
     serializer_class = UsersSerializer
 
     @action(
@@ -24,18 +48,30 @@ class UsersViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following__user=user)
-        if queryset:
-            pages = self.paginate_queryset(queryset)
-            serializer = FollowListSerializer(
-                pages,
-                many=True,
-                context={'request': request})
-            return self.get_paginated_response(serializer.data)
-        return Response(
-            'Нет подписок',
-            status=status.HTTP_400_BAD_REQUEST
+        queryset = User.objects.filter(following__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
         )
+        pages = self.paginate_queryset(queryset)
+        if not pages:
+            return Response(
+                'Нет подписок',
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        recipes = Recipe.objects.all()
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit and recipes_limit.isdigit():
+            recipes = recipes_limit_per_author(pages, int(recipes_limit))
+        prefetch_related_objects(pages, Prefetch(
+            'recipes',
+            queryset=recipes.only('id', 'name', 'image', 'image_variants',
+                                  'cooking_time', 'author_id'),
+            to_attr='limited_recipes'
+        ))
+        serializer = FollowListSerializer(
+            pages,
+            many=True,
+            context={'request': request})
+        return self.get_paginated_response(serializer.data)
 
     @action(
         detail=True,